@@ -0,0 +1,304 @@
+#! /usr/bin/env python
+"""
+boxmakerNBenchmarks.py
+Timings of the geometry generation and processing of the box maker.
+
+usage: python boxmakerNBenchmarks.py [name ...]
+runs all benchmarks or just the named ones
+"""
+
+import io, multiprocessing, os, resource, sys, tempfile, timeit
+from lxml import etree
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from boxmakerNLib import BoxGenerator, BoxMaker, BoxParameters, Direction, Part, Path, PathArray, Point, circleArc, \
+    line, livingHingeSlits, reliefCorners, kerfCompensate, affine, localParts, placeParts, partsExtent
+from boxmakerNTemplates import compileTemplate
+from boxmakerNSweep import sweep
+from boxmakerNBinary import GeometryFile, writeJob
+from boxmakerNStream import writeBoxes
+
+
+def best(function, repeat=3):
+    """best wall time of function in ms"""
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000.0
+
+
+def framesPath(boxMaker, tabs):
+    """a closed outline with the given number of tabs on its long edges"""
+    length = (2 * tabs + 1) * boxMaker.frameLength + 2 * boxMaker.frameEdgesMin
+    path = Path()
+    path.MoveTo(Point(0, 0))
+    path.extend(boxMaker.boxFrames(length, Direction.left))
+    path.lineBy(Point(0, 100))
+    path.extend(boxMaker.boxFrames(length, Direction.right))
+    path.lineBy(Point(0, -100))
+    return path
+
+
+def previousSimplify(path):
+    """Path.simplify before the tolerances: merges consecutive horizontal or vertical lines only"""
+    result = Path()
+    cursor = None
+    for atom in path:
+        if not isinstance(atom, line):
+            if cursor is not None:
+                result.append(cursor)
+                cursor = None
+            result.append(atom)
+        elif cursor is None:
+            cursor = line(Point(atom.p.x, atom.p.y))
+        elif atom.p.x == 0.0 and atom.p.y == 0.0:
+            pass
+        elif cursor.p.x == 0.0 and atom.p.x == 0.0:
+            cursor.p.y = cursor.p.y + atom.p.y
+        elif cursor.p.y == 0.0 and atom.p.y == 0.0:
+            cursor.p.x = cursor.p.x + atom.p.x
+        else:
+            result.append(cursor)
+            cursor = line(Point(atom.p.x, atom.p.y))
+    if cursor is not None:
+        result.append(cursor)
+    return result
+
+
+def benchmarkSimplify():
+    boxMaker = BoxMaker()
+    for tabs in (10, 100, 1000, 10000, 100000):
+        path = framesPath(boxMaker, tabs)
+        arr = PathArray.fromPaths([path])
+        print('simplify %7d tabs %8d atoms: %9.2f ms (previous %9.2f ms, through PathArray %9.2f ms, '
+              'arrays only %8.2f ms)' %
+              (tabs, len(path), best(path.simplify), best(lambda: previousSimplify(path)),
+               best(lambda: PathArray.fromPaths([path]).simplify().toPaths()[0]), best(arr.simplify)))
+
+
+def benchmarkRelief():
+    boxMaker = BoxMaker()
+    for tabs in (10, 100, 1000, 10000, 100000):
+        path = framesPath(boxMaker, tabs)
+        parts = [Part(path, 'black')]
+        corners = int((reliefCorners(parts, 1.0)[0].path.ops == 3).sum())
+        # as many points of the path, every call scans the whole path
+        points = [Point(x, y) for x, y in PathArray.fromPaths([path]).positions()[1:corners + 1].tolist()]
+
+        def oneByOne():
+            result = path
+            for point in points:
+                result = result.addRoundedEdgeAt(1.0, point)
+
+        direct = best(oneByOne, 1) if tabs <= 100 else float('nan')
+        print('relief %7d tabs %7d corners: %9.2f ms (addRoundedEdgeAt per corner %9.2f ms)' %
+              (tabs, corners, best(lambda: reliefCorners(parts, 1.0)), direct))
+
+
+def benchmarkKerf():
+    generator = BoxGenerator(BoxParameters(boxType='mobileLoader'))
+    generator.drawBox()
+    generator.drawMobileLoader()
+    local = localParts(generator.parts)
+    width, height = partsExtent(generator.parts)
+    for columns in (4, 10, 20):
+        # sheets of mobile loaders side by side, every part nested in none or one other
+        parts = placeParts([Part(part.path, part.color, part.r, part.center,
+                                 affine(width * (i % columns), height * (i // columns)) @ part.transform)
+                            for i in range(columns * columns // 2 + columns) for part in local])
+        print('kerf %6d parts: %9.2f ms' % (len(parts), best(lambda: kerfCompensate(parts, 0.2), 1)))
+
+
+def benchmarkFlatten():
+    for arcs in (100, 10000, 100000):
+        path = Path()
+        path.MoveTo(Point(0, 0))
+        for i in range(arcs // 2):
+            path.append(circleArc(3.0, Point(6, 0), '0', '1'))
+            path.append(circleArc(3.0, Point(6, 0), '0', '0'))
+        arr = PathArray.fromPaths([path])
+        for tolerance in (0.1, 0.001):
+            lines = len(arr.flatten(tolerance).ops) - 1
+            print('flatten %8d arcs, tolerance %.3f -> %9d lines: %9.2f ms' %
+                  (arcs, tolerance, lines, best(lambda: arr.flatten(tolerance))))
+
+
+def benchmarkLivingHinge():
+    for length in (30, 300, 3000):
+        slits = livingHingeSlits(Point(0, 0), 400, length, 10, 2, 1)
+        print('living hinge %5d mm -> %7d slits: %8.2f ms (svg path data %8.2f ms)' %
+              (length, len(slits.ops) // 2, best(lambda: livingHingeSlits(Point(0, 0), 400, length, 10, 2, 1)),
+               best(slits.translateToSVGd)))
+
+
+def benchmarkGrid():
+    for size in (10, 30, 100):
+        boxMaker = BoxMaker()
+        boxMaker.boxWidth = boxMaker.boxDepth = size * 30.0
+        boxMaker.gridColumns = boxMaker.gridRows = size
+
+        def dividers():
+            boxMaker.parts = []
+            boxMaker.drawGridDividers(Point(10, 10))
+            return PathArray.fromPaths([part.path for part in boxMaker.parts]).translateToSVGd()
+
+        atoms = len(dividers().split(' l ')) - 1
+        print('grid %4d x %4d -> %7d lines: %9.2f ms (geometry only %8.2f ms)' %
+              (size, size, atoms, best(dividers), best(lambda: boxMaker.drawGridDividers(Point(10, 10)))))
+
+
+def benchmarkConcurrent():
+    paramSets = [BoxParameters(boxType='gridBox', boxWidth=200.0 + i, gridColumns=10, gridRows=10, kerf=0.1)
+                 for i in range(64)]
+
+    def generate(params):
+        return BoxGenerator(params).generate()
+
+    print('%d generations sequential: %9.2f ms' % (len(paramSets), best(lambda: list(map(generate, paramSets)))))
+    for workers in (2, 4, 8):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            print('%d generations %d threads: %9.2f ms' %
+                  (len(paramSets), workers, best(lambda: list(pool.map(generate, paramSets)))))
+
+
+def benchmarkPlacement():
+    for size in (10, 50, 100):
+        params = BoxParameters(boxType='gridBox', boxWidth=size * 30.0, boxDepth=size * 30.0, gridColumns=size,
+                               gridRows=size)
+        generator = BoxGenerator(params)
+        generator.generate()
+        parts = generator.placed
+
+        def turned():
+            for part in parts:
+                part.transform = affine(0.0, 0.0, quarterTurns=1) @ part.transform
+            return placeParts(parts)
+
+        print('placement %4d parts: turned %9.2f ms (generated again %9.2f ms)' %
+              (len(parts), best(turned), best(lambda: BoxGenerator(params).generate())))
+
+
+def benchmarkTemplates():
+    template = compileTemplate('withHinge')
+    for count in (100, 1000, 10000):
+        widths = np.linspace(100.0, 400.0, count)
+        depths = np.linspace(80.0, 200.0, count)[::-1]
+
+        def drawn():
+            for width, depth in zip(widths.tolist(), depths.tolist()):
+                BoxGenerator(BoxParameters(boxWidth=width, boxDepth=depth)).drawBoxParts(Point(10, 10))
+
+        direct = best(drawn, 1) if count <= 1000 else float('nan')
+        print('templates %6d parameter sets: batch %9.2f ms, drawn one by one %9.2f ms' %
+              (count, best(lambda: template.evaluateBatch({'boxWidth': widths, 'boxDepth': depths})), direct))
+
+
+def benchmarkSweep():
+    for widths, depths, heights in ((10, 10, 10), (50, 40, 10), (100, 100, 10)):
+        ranges = {'boxWidth': np.linspace(100.0, 400.0, widths), 'boxDepth': np.linspace(80.0, 300.0, depths),
+                  'boxHeight': np.linspace(50.0, 200.0, heights), 'thickness': [3.0, 4.0, 5.0, 6.0, 8.0]}
+        print('sweep %8d combinations: %9.2f ms' % (widths * depths * heights * 5,
+                                                     best(lambda: sweep('withHinge', ranges), 1)))
+
+
+def benchmarkBinary():
+    directory = tempfile.mkdtemp()
+    for size in (10, 50, 150):
+        generator = BoxGenerator(BoxParameters(boxType='gridBox', boxWidth=size * 30.0, boxDepth=size * 30.0,
+                                               gridColumns=size, gridRows=size))
+        generator.generate()
+        binaryName = os.path.join(directory, 'job.bxg')
+        svgName = os.path.join(directory, 'job.svg')
+        writeJob(binaryName, generator)
+        with open(svgName, 'wb') as out:
+            out.write(generator.toSVG())
+
+        def parsed():
+            paths = etree.parse(svgName).getroot().iter('{http://www.w3.org/2000/svg}path')
+            return [path.get('d').split() for path in paths]
+
+        print('binary %4d parts %8d bytes (svg %8d bytes): load %8.3f ms, all coordinates %8.2f ms '
+              '(parse svg %8.2f ms)' % (len(generator.placed), os.path.getsize(binaryName), os.path.getsize(svgName),
+                                        best(lambda: GeometryFile(binaryName)),
+                                        best(lambda: GeometryFile(binaryName).pathArray().positions()), best(parsed)))
+
+
+def peakMemory(function, *args):
+    """increase of the peak resident memory (MB) and wall time (s) of function, run in a fresh process"""
+
+    def measured(queue):
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = timeit.default_timer()
+        function(*args)
+        queue.put(((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024.0,
+                   timeit.default_timer() - start))
+
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(target=measured, args=(queue,))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def benchmarkStream():
+    directory = tempfile.mkdtemp()
+    fileName = os.path.join(directory, 'boxes.svg')
+
+    def paramSets(count):
+        return (BoxParameters(boxWidth=100.0 + i % 300, boxDepth=80.0 + i % 120) for i in range(count))
+
+    def inMemory(count):
+        root = etree.Element('{http://www.w3.org/2000/svg}svg')
+        for params in paramSets(count):
+            generator = BoxGenerator(params)
+            generator.generate()
+            generator.writeTo(etree.SubElement(root, '{http://www.w3.org/2000/svg}g'))
+        etree.ElementTree(root).write(fileName, xml_declaration=True, encoding='UTF-8')
+
+    for count in (100, 1000, 10000):
+        streamed, streamTime = peakMemory(lambda: writeBoxes(fileName, paramSets(count)))
+        size = os.path.getsize(fileName) / 1024.0 / 1024.0
+        tree, treeTime = peakMemory(inMemory, count)
+        print('stream %6d boxes (%7.1f MB svg): peak memory +%7.1f MB %6.1f s (in memory tree +%7.1f MB %6.1f s)' %
+              (count, size, streamed, streamTime, tree, treeTime))
+
+
+def benchmarkGenerateOnly():
+    directory = tempfile.mkdtemp()
+    fileName = os.path.join(directory, 'drawing.svg')
+    args = ['--boxType=openBox', '--thickness=4', '--frameEdgesMin=5', '--frameLength=10', fileName]
+    for boxes in (10, 100, 1000):
+        # a drawing with the parts of many boxes already in it
+        root = etree.Element('{http://www.w3.org/2000/svg}svg', {'width': '1000mm', 'height': '1000mm',
+                                                                 'viewBox': '0 0 1000 1000'})
+        layer = etree.SubElement(root, '{http://www.w3.org/2000/svg}g', {'id': 'layer1'})
+        for i in range(boxes):
+            generator = BoxGenerator(BoxParameters(boxWidth=100.0 + i % 300))
+            generator.generate()
+            generator.writeTo(etree.SubElement(layer, '{http://www.w3.org/2000/svg}g'))
+        etree.ElementTree(root).write(fileName)
+        parts = len(layer.findall('*/*'))
+        print('generate into %6d parts (%6.1f MB): whole document %9.2f ms, generate only %8.2f ms' %
+              (parts, os.path.getsize(fileName) / 1024.0 / 1024.0,
+               best(lambda: BoxMaker().run(args, io.BytesIO())),
+               best(lambda: BoxMaker().run(['--generateOnly=true'] + args, io.BytesIO()))))
+
+
+benchmarks = {
+    'simplify': benchmarkSimplify,
+    'flatten': benchmarkFlatten,
+    'relief': benchmarkRelief,
+    'kerf': benchmarkKerf,
+    'livingHinge': benchmarkLivingHinge,
+    'grid': benchmarkGrid,
+    'concurrent': benchmarkConcurrent,
+    'placement': benchmarkPlacement,
+    'templates': benchmarkTemplates,
+    'sweep': benchmarkSweep,
+    'binary': benchmarkBinary,
+    'stream': benchmarkStream,
+    'generateOnly': benchmarkGenerateOnly,
+}
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or benchmarks:
+        benchmarks[name]()
@@ -0,0 +1,195 @@
+#! /usr/bin/env python
+"""
+boxmakerNBinary.py
+A compact binary container of generated geometry, loaded zero-copy with numpy.memmap, and its
+conversion to svg.
+
+usage: python boxmakerNBinary.py job.bxg [job.svg]    converts a container to svg (default: standard output)
+
+    writeJob('job.bxg', generator)          # the parts of a generation run (after generate())
+    job = GeometryFile('job.bxg')           # memory mapped, nothing is read before it is used
+    job.pathArray()                         # all paths as one PathArray of memmap views
+    svg = job.toSVG()
+
+Layout (all numbers little endian, every section starts at a multiple of 64 bytes):
+
+    header       one HEADER record (128 bytes):
+                 magic b'BOXGEOM1', version, flags (bit 0: fixed, xy in grid units of FixedPoint, bit 1:
+                 transforms, the parts are in their local frame and placed by their transforms),
+                 partCount, atomCount, width and height (the extent of the parts), lineWidth (stroke width
+                 of the cuts) and the byte offsets of the sections: partTable, colors (with colorsSize),
+                 ops, xy and arc
+    partTable    partCount PART records (96 bytes): start and count of the atoms of a path, radius and
+                 center of a circle, index of the color, kind (PATH or CIRCLE) and the placement of the
+                 part as svg matrix(a, b, c, d, e, f) (the identity without the transforms flag)
+    colors       the names of the colors, utf-8, separated by newlines
+    ops          atomCount uint8 opcodes (OP_MOVE, OP_MOVE_REL, OP_LINE, OP_ARC of boxmakerNLib)
+    xy           atomCount x 2 float64 (int64 if fixed): the point of every atom, absolute for OP_MOVE
+                 and for the first atom of a path, relative otherwise
+    arc          atomCount x 3 float64: radius (in grid units if fixed), largeArc and sweepFlag of arcs
+
+These are the arrays of PathArray, the paths of the parts follow each other in their order.
+The svg of a container has the same path and circle elements as the generation run, with the
+transform attributes of placement 'transform'.
+"""
+
+import sys
+import numpy as np
+from boxmakerNLib import BoxGenerator, BoxParameters, Part, PathArray, Point, placeParts
+
+MAGIC = b'BOXGEOM1'
+VERSION = 2
+FLAG_FIXED = 1
+FLAG_TRANSFORMS = 2
+ALIGNMENT = 64
+
+PATH = 0
+CIRCLE = 1
+
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('flags', '<u4'), ('partCount', '<u8'),
+                   ('atomCount', '<u8'), ('width', '<f8'), ('height', '<f8'), ('lineWidth', '<f8'),
+                   ('partTable', '<u8'), ('colors', '<u8'), ('colorsSize', '<u8'), ('ops', '<u8'), ('xy', '<u8'),
+                   ('arc', '<u8'), ('reserved', '<u8', 3)])
+PART = np.dtype([('start', '<u8'), ('count', '<u8'), ('r', '<f8'), ('cx', '<f8'), ('cy', '<f8'),
+                 ('color', '<u4'), ('kind', 'u1'), ('reserved', 'u1', 3), ('transform', '<f8', 6)])
+
+
+def aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def writeGeometry(fileName, parts, extent=(0.0, 0.0), lineWidth=0.1, fixed=False, transforms=False):
+    """
+    writes the parts to a container, the paths snapped to the grid if fixed. The parts are placed
+    already, or in their local frame with their transforms (Part.transform) if transforms.
+    """
+    paths = [part.path for part in parts if part.path is not None]
+    arr = PathArray.fromPaths(paths, fixed) if paths else PathArray(
+        np.zeros(0, dtype=np.uint8), np.zeros((0, 2)), np.zeros((0, 3)), np.zeros(1, dtype=np.intp), fixed)
+    colors = list(dict.fromkeys(part.color for part in parts))
+    colorNames = '\n'.join(colors).encode('utf-8')
+
+    table = np.zeros(len(parts), dtype=PART)
+    kinds = np.array([part.path is None for part in parts], dtype=bool)
+    table['kind'] = np.where(kinds, CIRCLE, PATH)
+    table['color'] = [colors.index(part.color) for part in parts]
+    table['start'][~kinds] = arr.offsets[:-1]
+    table['count'][~kinds] = np.diff(arr.offsets)
+    table['transform'] = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+    if transforms:
+        table['transform'] = [part.transform[:2].T.ravel() for part in parts]
+    for i in np.flatnonzero(kinds).tolist():
+        table['r'][i] = parts[i].r
+        table['cx'][i] = parts[i].center.x
+        table['cy'][i] = parts[i].center.y
+
+    header = np.zeros(1, dtype=HEADER)
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['flags'] = (FLAG_FIXED if fixed else 0) | (FLAG_TRANSFORMS if transforms else 0)
+    header['partCount'] = len(parts)
+    header['atomCount'] = len(arr.ops)
+    header['width'], header['height'] = extent[0], extent[1]
+    header['lineWidth'] = lineWidth
+    sections = [('partTable', table.tobytes()), ('colors', colorNames),
+                ('ops', arr.ops.astype(np.uint8).tobytes()),
+                ('xy', arr.xy.astype('<i8' if fixed else '<f8').tobytes()), ('arc', arr.arc.astype('<f8').tobytes())]
+    offset = aligned(HEADER.itemsize)
+    for name, data in sections:
+        header[name] = offset
+        offset = aligned(offset + len(data))
+    header['colorsSize'] = len(colorNames)
+
+    with open(fileName, 'wb') as out:
+        out.write(header.tobytes())
+        for name, data in sections:
+            out.write(b'\0' * (int(header[name][0]) - out.tell()))
+            out.write(data)
+
+
+def writeJob(fileName, generator):
+    """writes the parts of a generation run (after generate) as they are written to the document"""
+    if generator.placement == 'transform':
+        writeGeometry(fileName, generator.placed, generator.extent, generator.lineWidth, generator.fixedPoint, True)
+    else:
+        writeGeometry(fileName, placeParts(generator.placed), generator.extent, generator.lineWidth,
+                      generator.fixedPoint)
+
+
+class GeometryFile:
+    """a container mapped into memory, the arrays are read-only views of the file"""
+
+    def __init__(self, fileName):
+        self.header = np.memmap(fileName, dtype=HEADER, mode='r', shape=(1,))[0]
+        if bytes(self.header['magic']) != MAGIC or self.header['version'] != VERSION:
+            raise ValueError('%s is no box geometry container (version %d)' % (fileName, VERSION))
+        self.fixed = bool(self.header['flags'] & FLAG_FIXED)
+        self.transforms = bool(self.header['flags'] & FLAG_TRANSFORMS)
+        partCount = int(self.header['partCount'])
+        atomCount = int(self.header['atomCount'])
+
+        def section(name, dtype, shape):
+            if not np.prod(shape):
+                return np.zeros(shape, dtype=dtype)
+            return np.memmap(fileName, dtype=dtype, mode='r', offset=int(self.header[name]), shape=shape)
+
+        self.parts = section('partTable', PART, (partCount,))
+        self.ops = section('ops', np.uint8, (atomCount,))
+        self.xy = section('xy', '<i8' if self.fixed else '<f8', (atomCount, 2))
+        self.arc = section('arc', '<f8', (atomCount, 3))
+        colors = bytes(section('colors', np.uint8, (int(self.header['colorsSize']),))).decode('utf-8')
+        self.colors = colors.split('\n')
+
+    def __len__(self):
+        return len(self.parts)
+
+    def pathArray(self):
+        """the paths of all path parts as one PathArray (in their local frames if transforms)"""
+        paths = self.parts[self.parts['kind'] == PATH]
+        offsets = np.append(paths['start'], paths['start'][-1] + paths['count'][-1] if len(paths) else 0)
+        return PathArray(self.ops, self.xy, self.arc, offsets.astype(np.intp), self.fixed)
+
+    def part(self, i):
+        """the part i, with its transform if transforms"""
+        record = self.parts[i]
+        color = self.colors[int(record['color'])]
+        transform = None
+        if self.transforms:
+            transform = np.vstack((record['transform'].reshape(3, 2).T, (0.0, 0.0, 1.0)))
+        if record['kind'] == CIRCLE:
+            return Part(None, color, float(record['r']), Point(float(record['cx']), float(record['cy'])), transform)
+        a = int(record['start'])
+        b = a + int(record['count'])
+        return Part(PathArray(self.ops[a:b], self.xy[a:b], self.arc[a:b], np.array([0, b - a], dtype=np.intp),
+                              self.fixed), color, transform=transform)
+
+    def elements(self):
+        """the svg elements of the parts, the same as written by BoxGenerator"""
+        generator = BoxGenerator(BoxParameters(lineWidth=float(self.header['lineWidth'])))
+        for i in range(len(self)):
+            part = self.part(i)
+            if part.path is None:
+                generator.writeCircle(part.r, part.center, part.color, part.transform)
+            else:
+                generator.writePath(part.path, part.color, part.transform)
+        generator.extent = np.array([self.header['width'], self.header['height']], dtype=float)
+        return generator
+
+    def toSVG(self, margin=10.0):
+        """the parts as standalone svg document"""
+        return self.elements().toSVG(margin)
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        sys.exit(__doc__.split('\n\n')[1])
+    svg = GeometryFile(sys.argv[1]).toSVG()
+    if len(sys.argv) == 3:
+        with open(sys.argv[2], 'wb') as out:
+            out.write(svg)
+    else:
+        sys.stdout.buffer.write(svg)
+
+
+if __name__ == '__main__':
+    main()
@@ -25,9 +25,11 @@ Updated for InkScape 1.2 by Michael Breu 12/04/2022
 
 __version__ = "1.0"
 
+from collections import namedtuple
 from datetime import datetime
-import sys, inkex, simplestyle, gettext
+import io, inkex, simplestyle, gettext, json
 import math, abc
+import numpy as np
 from lxml import etree
 
 _ = gettext.gettext
@@ -55,6 +57,12 @@ withHinge = BoxType('Box with Hinges', True)
 openBox = BoxType('just an open Box', False)
 mobileLoader = BoxType('box for mobile Loader', True)
 shelvedBox = BoxType('Box with shelves', False)
+livingHingeBox = BoxType('Box with living hinge lid', False)
+gridBox = BoxType('Box with a grid of dividers', False)
+
+# the box types by their option value
+boxTypes = {'withHinge': withHinge, 'openBox': openBox, 'mobileLoader': mobileLoader,
+            'openBoxWithShelves': shelvedBox, 'livingHinge': livingHingeBox, 'gridBox': gridBox}
 
 
 class Direction:
@@ -64,25 +72,87 @@ class Direction:
     right = dict([('frameMove', [-1.0, 0.0]), ('walkIn', [0.0, 1.0]), ('walkOut', [0.0, -1.0])])
 
 
+# opcodes of the flat array representation of paths (see PathArray)
+OP_MOVE = 0
+OP_MOVE_REL = 1
+OP_LINE = 2
+OP_ARC = 3
+
+# lengths (in user units) below this are treated as zero
+EPSILON = 1e-6
+
+
+# grid units per user unit of FixedPoints (micrometres in mm documents)
+FIXED_SCALE = 1000
+
+
 class Point:
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            # TODO: equality on real is difficult
-            return self.__dict__ == other.__dict__
+            # TODO: equality on real is difficult, use FixedPoint if it matters
+            return self.x == other.x and self.y == other.y
         else:
             return False
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    def __hash__(self):
+        return hash((self.x, self.y))
+
     def add(self, x, y):
         return Point(self.x + x, self.y + y)
 
 
+class FixedPoint:
+    """
+    a point on a grid of 1/FIXED_SCALE user units
+    The coordinates are kept as integers (ix, iy), so sums are exact and
+    points can be compared and used as keys of dicts and sets.
+    """
+    __slots__ = ('ix', 'iy')
+
+    def __init__(self, x, y):
+        self.ix = int(round(x * FIXED_SCALE))
+        self.iy = int(round(y * FIXED_SCALE))
+
+    @staticmethod
+    def fromGrid(ix, iy):
+        point = FixedPoint.__new__(FixedPoint)
+        point.ix = ix
+        point.iy = iy
+        return point
+
+    @property
+    def x(self):
+        return self.ix / FIXED_SCALE
+
+    @property
+    def y(self):
+        return self.iy / FIXED_SCALE
+
+    def __eq__(self, other):
+        if isinstance(other, FixedPoint):
+            return self.ix == other.ix and self.iy == other.iy
+        else:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self.ix, self.iy))
+
+    def add(self, x, y):
+        return FixedPoint.fromGrid(self.ix + int(round(x * FIXED_SCALE)), self.iy + int(round(y * FIXED_SCALE)))
+
+
 class SVGPathAtom:
     @abc.abstractmethod
     def toSVGString():
@@ -145,8 +215,24 @@ class circleArc(SVGPathAtom):
         # inkex.debug("  end %.2f %.2f"% (end_pos.x, end_pos.y))
         return end_pos
 
+    def geometry(self, x, y):
+        """center, effective radius and signed angular extent of the arc starting at x, y (like arcAngles)"""
+        ex, ey = x + self.endPoint.x, y + self.endPoint.y
+        dx, dy = ex - x, ey - y
+        length = math.hypot(dx, dy)
+        radius = max(self.r, length / 2.0)
+        h = math.sqrt(max(radius ** 2 - (length / 2.0) ** 2, 0.0))
+        side = 1.0 if int(self.largeArc) != int(self.sweepFlag) else -1.0
+        scale = length if length > 0.0 else 1.0
+        cx, cy = (x + ex) / 2.0 + side * h * (-dy / scale), (y + ey) / 2.0 + side * h * (dx / scale)
+        angle = math.atan2(y - cy, x - cx)
+        extent = (math.atan2(ey - cy, ex - cx) - angle) % (2.0 * math.pi)
+        return cx, cy, radius, extent if int(self.sweepFlag) else extent - 2.0 * math.pi
+
 
 class Path(list):
+    origin = Point(0.0, 0.0)
+
     def __init__(self, *args):
         list.__init__(self, *args)
 
@@ -168,69 +254,128 @@ class Path(list):
         return s
 
     def finalPosition(self):
-        pos = Point(0.0, 0.0)
+        pos = self.origin
         for atoms in self:
             pos = atoms.newPos(pos)
         return pos
 
-    def simplify(self):
-        """combines elements in the path which are identical"""
+    def simplify(self, epsilon=EPSILON):
+        """
+        combines collinear lines and arcs on the same circle, drops empty segments
+        (one pass over the atoms, with the same result as PathArray.simplify)
+        """
         result = Path()
-        cursorElement = None
+        # the sum of the lines merged so far and the last of them
+        sx = sy = qx = qy = qLength = 0.0
+        squared = epsilon * epsilon
+        lines = False
+        # the arcs merged so far, with center, radius and extent
+        arcs = []
+        x = y = 0.0
         for atom in self:
-            if isinstance(atom, Move) or isinstance(atom, move) or isinstance(atom, circleArc):
-                # inkex.debug("nope %s"% atom)
-                if not cursorElement is None:
-                    result.append(cursorElement)
-                    cursorElement = None
-                result.append(atom)
-            elif isinstance(atom, line):
-                # inkex.debug("trying %.2f %.2f" % (atom.p.x, atom.p.y))
-                if cursorElement is None:
-                    cursorElement = line(Point(atom.p.x, atom.p.y))
+            kind = atom.__class__
+            if kind is line:
+                px, py = atom.p.x, atom.p.y
+                # squared lengths and tolerances, without a call per atom
+                length = px * px + py * py
+                if length <= squared:
+                    continue
+                cross = qx * py - qy * px
+                if lines and cross * cross <= squared * (length if length > qLength else qLength):
+                    sx += px
+                    sy += py
                 else:
-                    if atom.p.x == 0.0 and atom.p.y == 0.0:  # empty line
-                        pass
-                    elif cursorElement.p.x == 0.0 and atom.p.x == 0.0:
-                        cursorElement.p.y = cursorElement.p.y + atom.p.y
-                        # debug("combining %.2f"% cursorElement.p.y)
-
-                    elif cursorElement.p.y == 0.0 and atom.p.y == 0.0:
-                        cursorElement.p.x = cursorElement.p.x + atom.p.x
-                        # inkex.debug("combining %.2f"% cursorElement.p.x)
-
-                    else:  # nicht kombinierbar
-                        result.append(cursorElement)
-                        # inkex.debug("pushing")
-                        cursorElement = line(Point(atom.p.x, atom.p.y))
-            else:
-                inkex.debug("this is an error %s" % atom)
-        if not cursorElement is None:
-            result.append(cursorElement)
+                    if lines:
+                        result.appendLine(sx, sy, epsilon)
+                    elif arcs:
+                        result.appendArcs(arcs, epsilon)
+                        arcs = []
+                    sx, sy, lines = px, py, True
+                qx, qy, qLength = px, py, length
+                x += px
+                y += py
+                continue
+            if kind is circleArc:
+                px, py = atom.endPoint.x, atom.endPoint.y
+                if px * px + py * py <= squared:
+                    continue
+                if lines:
+                    result.appendLine(sx, sy, epsilon)
+                    lines = False
+                current = (atom,) + atom.geometry(x, y)
+                if arcs:
+                    previous = arcs[-1]
+                    if not (abs(current[3] - previous[3]) <= epsilon and
+                            math.hypot(current[1] - previous[1], current[2] - previous[2]) <= epsilon and
+                            int(atom.sweepFlag) == int(previous[0].sweepFlag)):
+                        result.appendArcs(arcs, epsilon)
+                        arcs = []
+                arcs.append(current)
+                x += px
+                y += py
+                continue
+            if lines:
+                result.appendLine(sx, sy, epsilon)
+                lines = False
+            elif arcs:
+                result.appendArcs(arcs, epsilon)
+                arcs = []
+            result.append(atom)
+            x, y = (atom.p.x, atom.p.y) if kind is Move else (x + atom.p.x, y + atom.p.y)
+        if lines:
+            result.appendLine(sx, sy, epsilon)
+        elif arcs:
+            result.appendArcs(arcs, epsilon)
         return result
 
-        cursorElement = self[0]
+    def appendLine(self, dx, dy, epsilon):
+        """appends the sum of consecutive parallel lines, unless lines in opposite directions cancel out"""
+        if math.hypot(dx, dy) > epsilon:
+            self.append(line(Point(dx, dy)))
+
+    def appendArcs(self, arcs, epsilon):
+        """appends consecutive arcs on the same circle as one, unless they close a full circle"""
+        if len(arcs) == 1:
+            self.append(arcs[0][0])
+            return
+        total = sum(arc[4] for arc in arcs)
+        if abs(total) >= 2.0 * math.pi - epsilon:
+            self.extend(arc[0] for arc in arcs)
+            return
+        dx = dy = 0.0
+        for arc in arcs:
+            dx += arc[0].endPoint.x
+            dy += arc[0].endPoint.y
+        if math.hypot(dx, dy) > epsilon:
+            largeArc = abs(total) > math.pi + epsilon
+            self.append(circleArc(arcs[0][3], Point(dx, dy), '%d' % largeArc, '%d' % int(arcs[0][0].sweepFlag)))
+
+    def toFixed(self):
+        """returns the path snapped to the grid of FixedPoints (without accumulating rounding errors)"""
+        return PathArray.fromPaths([self], True).toPaths()[0]
 
     def addRoundedEdgeAt(self, radius, point, debug=False):
         """add a roundes Edge at position point"""
-        pos = Point(0.0, 0.0)
+        return self.addRoundedEdgesAt(radius, [point], debug)
+
+    def addRoundedEdgesAt(self, radius, points, debug=False):
+        """add rounded edges at all the given positions in a single pass"""
+        corners = set(points)
+        pos = self.origin
         result = Path()
-        skip = False
+        # the line after a rounded edge is replaced by a shortened one, which may get rounded as well
+        atoms = list(self)
         for i in range(0, len(self)):
-            atom = self[i]
-            pos = atom.newPos(pos)
-            if skip:
-                skip = False
-                continue
-            if debug: inkex.debug(
-                "Test %s  (%.2f, %.2f) against (%.2f, %.2f)" % (repr(i), point.x, point.y, pos.x, pos.y))
-            if pos == point and isinstance(atom, line):
+            atom = atoms[i]
+            pos = self[i].newPos(pos)
+            if debug: inkex.debug("Test %s  (%.2f, %.2f)" % (repr(i), pos.x, pos.y))
+            if pos in corners and isinstance(atom, line):
 
                 lx = atom.p.x
                 ly = atom.p.y
                 if ly == 0.0:
                     if lx < 0.0:
-                        nextLine = self[i + 1]
+                        nextLine = atoms[i + 1]
                         if isinstance(nextLine, line) and nextLine.p.x == 0.0:
                             if debug: inkex.debug("Here 1.1 %s" % (repr(i)))
                             shortenedLine = line(Point(lx + radius, ly))
@@ -242,13 +387,11 @@ class Path(list):
                                 newNextLine = line(Point(nextLine.p.x, nextLine.p.y - radius))
                             result.append(shortenedLine)
                             result.append(arc)
-                            result.append(newNextLine)
-                            pos = nextLine.newPos(pos)
-                            skip = True
+                            atoms[i + 1] = newNextLine
                         else:
                             result.append(atom)
                     else:
-                        nextLine = self[i + 1]
+                        nextLine = atoms[i + 1]
                         if isinstance(nextLine, line) and nextLine.p.x == 0.0:
                             if debug: inkex.debug("Here 1.2 %s" % (repr(i)))
                             shortenedLine = line(Point(lx - radius, ly))
@@ -260,14 +403,12 @@ class Path(list):
                                 newNextLine = line(Point(nextLine.p.x, nextLine.p.y - radius))
                             result.append(shortenedLine)
                             result.append(arc)
-                            result.append(newNextLine)
-                            pos = nextLine.newPos(pos)
-                            skip = True
+                            atoms[i + 1] = newNextLine
                         else:
                             result.append(atom)
                 elif lx == 0.0:
                     if ly < 0.0:
-                        nextLine = self[i + 1]
+                        nextLine = atoms[i + 1]
                         if isinstance(nextLine, line) and nextLine.p.y == 0.0:
                             if debug: inkex.debug("Here 2.1 %s" % (repr(i)))
                             shortenedLine = line(Point(lx, ly + radius))
@@ -279,14 +420,12 @@ class Path(list):
                                 newNextLine = line(Point(nextLine.p.x - radius, nextLine.p.y))
                             result.append(shortenedLine)
                             result.append(arc)
-                            result.append(newNextLine)
-                            pos = nextLine.newPos(pos)
-                            skip = True
+                            atoms[i + 1] = newNextLine
                         else:
                             result.append(atom)
                     else:
                         if debug: inkex.debug("Here 2.2 %s" % (repr(i)))
-                        nextLine = self[i + 1]
+                        nextLine = atoms[i + 1]
                         if isinstance(nextLine, line) and nextLine.p.y == 0.0:
                             shortenedLine = line(Point(lx, ly - radius))
                             if nextLine.p.x < 0.0:
@@ -297,9 +436,7 @@ class Path(list):
                                 newNextLine = line(Point(nextLine.p.x - radius, nextLine.p.y))
                             result.append(shortenedLine)
                             result.append(arc)
-                            result.append(newNextLine)
-                            pos = nextLine.newPos(pos)
-                            skip = True
+                            atoms[i + 1] = newNextLine
                         else:
                             result.append(atom)
             else:
@@ -307,81 +444,1045 @@ class Path(list):
         return result
 
 
-class BoxMaker(inkex.Effect):
-    def __init__(self):
-        self.boxType = withHinge
-        self.boxWidth = 200.0
-        self.boxDepth = 100.0
-        self.boxHeight = 70.0
-        self.thickness = 4.0
-        self.shelfCount = 1
-
-        self.frameEdgesMin = 5.0
-        self.frameLength = 10.0
-        self.hingeCircleFactor = 1.5
-        self.debug = False
+class FixedPath(Path):
+    """a path of atoms with FixedPoints, see Path.toFixed"""
+    origin = FixedPoint(0, 0)
 
-        # Call the base class constructor.
-        inkex.Effect.__init__(self)
-        # Define options - Must match to the <param> elements in the .inx file
-        # just dummies for the tabs
-        self.arg_parser.add_argument('--tab', action='store', dest='tab', type=str, default='mm',
-                                     help='just a dummy')
-        self.arg_parser.add_argument('--HingeAndFrame', action='store', dest='tab', type=str, default='mm',
-                                     help='just a dummy')
-        self.arg_parser.add_argument('--Development', action='store', dest='tab', type=str, default='mm',
-                                     help='just a dummy')
+    def simplify(self, epsilon=0):
+        """like Path.simplify, but epsilon is in grid units and compares exactly by default"""
+        return PathArray.fromPaths([self], True).simplify(epsilon).toPaths()[0]
 
-        self.arg_parser.add_argument('--boxType', action='store', dest='boxType', type=str, default='openBox',
-                                     help='Type of Box')
-        self.arg_parser.add_argument('--unit', action='store', dest='unit', type=str, default='mm',
-                                     help='units of measurement')
+    def addRoundedEdgesAt(self, radius, points, debug=False):
+        points = [FixedPoint(point.x, point.y) for point in points]
+        return Path.addRoundedEdgesAt(self, radius, points, debug).toFixed()
 
-        self.arg_parser.add_argument('--box_width', action='store', type=float, dest='boxWidth', default=200.0,
-                                     help='width of the box.')
-        self.arg_parser.add_argument('--box_depth', action='store', type=float, dest='boxDepth', default=120.0,
-                                     help='depth of the box.')
-        self.arg_parser.add_argument('--box_height', action='store', type=float, dest='boxHeight', default=70.0,
-                                     help='height of the box.')
-        self.arg_parser.add_argument('--thickness', action='store', type=float, dest='thickness', default=0,
-                                     help='thickness of the material.')
-        self.arg_parser.add_argument('--shelfCount', action='store', type=int, dest='shelfCount', default=1,
-                                     help='number of shelves.')
 
-        self.arg_parser.add_argument('--frameEdgesMin', action='store', type=float, dest='frameEdgesMin', default=0,
-                                     help='Minimum distance of frame to edge.')
-        self.arg_parser.add_argument('--frameLength', action='store', type=float, dest='frameLength', default=0,
-                                     help='Length of a frame.')
-        self.arg_parser.add_argument('--hingeCircleFactor', action='store', type=float, dest='hingeCircleFactor',
-                                     default=1.5, help='Size of hinge circle.')
+class PathArray:
+    """
+    Flat array representation of one or more paths, used for vectorized
+    processing of the generated geometry.
+
+    ops:     opcode of every atom (OP_MOVE, OP_MOVE_REL, OP_LINE, OP_ARC)
+    xy:      point of every atom, absolute for OP_MOVE and relative otherwise
+    arc:     radius, largeArc and sweepFlag of arcs (zero for other atoms)
+    offsets: the atoms of path i are at offsets[i]:offsets[i + 1]
+    fixed:   if True, xy are integers and xy and radii are in grid units of FixedPoint
+    whole:   for the arrays of split, the array they were split from and their index in it
+    """
 
-        self.arg_parser.add_argument('--debug', action='store', type=bool, dest='debug', default='False',
-                                     help='debug Info')
+    whole = None
 
-    def effect(self):
-        if self.options.boxType == 'withHinge':
-            self.boxType = withHinge
-        elif self.options.boxType == 'openBox':
-            self.boxType = openBox
-        elif self.options.boxType == 'mobileLoader':
-            self.boxType = mobileLoader
-        elif self.options.boxType == 'openBoxWithShelves':
-            self.boxType = shelvedBox
+    def __init__(self, ops, xy, arc, offsets, fixed=False):
+        self.ops = ops
+        self.xy = xy
+        self.arc = arc
+        self.offsets = offsets
+        self.fixed = fixed
 
-        unit = self.options.unit
-        self.unit = unit
-        # starting cut length. Will be adjusted for get an integer number of cuts in the y-direction.
-        self.boxWidth = self.svg.unittouu(str(self.options.boxWidth) + unit)
-        self.boxDepth = self.svg.unittouu(str(self.options.boxDepth) + unit)
-        self.boxHeight = self.svg.unittouu(str(self.options.boxHeight) + unit)
-        self.thickness = self.svg.unittouu(str(self.options.thickness) + unit)
-        self.shelfcount = self.options.shelfCount
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @staticmethod
+    def fromPaths(paths, fixed=False):
+        """
+        arrays of the given Paths (or PathArrays), snapped to the grid of FixedPoints if fixed.
+        The arrays split from one array, all of them in their order, are that array without a copy.
+        """
+        whole = paths[0].whole if len(paths) and isinstance(paths[0], PathArray) else None
+        if whole is not None and len(whole[0]) == len(paths) and \
+                all(path.whole is not None and path.whole[0] is whole[0] and path.whole[1] == i
+                    for i, path in enumerate(paths)):
+            arr = whole[0].toFloat()
+            return PathArray.snap(arr) if fixed else arr
+        arrays = []
+        ops = []
+        xy = []
+        arc = []
+        offsets = [0]
+        for path in paths:
+            if isinstance(path, PathArray):
+                if len(offsets) > 1:
+                    arrays.append(PathArray(np.array(ops, dtype=np.uint8), np.array(xy, dtype=float).reshape(-1, 2),
+                                            np.array(arc, dtype=float).reshape(-1, 3),
+                                            np.array(offsets, dtype=np.intp)))
+                    ops, xy, arc, offsets = [], [], [], [0]
+                arrays.append(path.toFloat())
+                continue
+            for atom in path:
+                if isinstance(atom, circleArc):
+                    ops.append(OP_ARC)
+                    xy.append((atom.endPoint.x, atom.endPoint.y))
+                    arc.append((atom.r, int(atom.largeArc), int(atom.sweepFlag)))
+                    continue
+                if isinstance(atom, Move):
+                    ops.append(OP_MOVE)
+                elif isinstance(atom, move):
+                    ops.append(OP_MOVE_REL)
+                elif isinstance(atom, line):
+                    ops.append(OP_LINE)
+                else:
+                    inkex.debug("this is an error %s" % atom)
+                    continue
+                xy.append((atom.p.x, atom.p.y))
+                arc.append((0.0, 0.0, 0.0))
+            offsets.append(len(ops))
+        if len(offsets) > 1 or not arrays:
+            arrays.append(PathArray(np.array(ops, dtype=np.uint8), np.array(xy, dtype=float).reshape(-1, 2),
+                                    np.array(arc, dtype=float).reshape(-1, 3), np.array(offsets, dtype=np.intp)))
+        arr = arrays[0] if len(arrays) == 1 else PathArray.concatenate(arrays)
+        return PathArray.snap(arr) if fixed else arr
+
+    @staticmethod
+    def snap(arr):
+        """the (float) array snapped to the grid of FixedPoints"""
+        # snap the absolute positions, so the rounding errors of relative atoms do not add up
+        grid = np.rint(arr.positions() * FIXED_SCALE).astype(np.int64)
+        arr = PathArray(arr.ops, grid, arr.arc, arr.offsets, True).withPositions(grid)
+        arr.arc[:, 0] = np.rint(arr.arc[:, 0] * FIXED_SCALE)
+        return arr
+
+    @staticmethod
+    def concatenate(arrays):
+        """one PathArray holding the paths of all given arrays (which are all fixed or all not)"""
+        bases = np.cumsum([0] + [len(arr.ops) for arr in arrays[:-1]])
+        offsets = np.concatenate([[0]] + [arr.offsets[1:] + base for arr, base in zip(arrays, bases)])
+        return PathArray(np.concatenate([arr.ops for arr in arrays]), np.concatenate([arr.xy for arr in arrays]),
+                         np.concatenate([arr.arc for arr in arrays]), offsets.astype(np.intp), arrays[0].fixed)
+
+    def split(self):
+        """one PathArray per path, views of this array"""
+        bounds = self.offsets.tolist()
+        paths = [PathArray(self.ops[a:b], self.xy[a:b], self.arc[a:b], np.array([0, b - a], dtype=np.intp), self.fixed)
+                 for a, b in zip(bounds, bounds[1:])]
+        for i, path in enumerate(paths):
+            path.whole = (self, i)
+        return paths
+
+    def take(self, indices):
+        """the paths with the given indices, in their order"""
+        counts = np.diff(self.offsets)[indices]
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.intp)
+        atoms = np.repeat(self.offsets[:-1][indices] - offsets[:-1], counts) + np.arange(offsets[-1])
+        return PathArray(self.ops[atoms], self.xy[atoms], self.arc[atoms], offsets, self.fixed)
+
+    def toFloat(self):
+        if not self.fixed:
+            return self
+        arc = self.arc.copy()
+        arc[:, 0] /= FIXED_SCALE
+        return PathArray(self.ops, self.xy / FIXED_SCALE, arc, self.offsets)
+
+    def toFixed(self):
+        return PathArray.fromPaths([self], True)
+
+    def translateToSVGd(self):
+        """the SVG path data of all paths, the same as Path.translateToSVGd of the atoms"""
+        arr = self.toFloat()
+        s = []
+        for op, (x, y), (r, largeArc, sweepFlag) in zip(arr.ops.tolist(), arr.xy.tolist(), arr.arc.tolist()):
+            if op == OP_LINE:
+                s.append("l %f %f " % (x, y))
+            elif op == OP_ARC:
+                s.append("a %f %f 0 %d %d %f %f " % (r, r, largeArc, sweepFlag, x, y))
+            elif op == OP_MOVE:
+                s.append("M %f %f " % (x, y))
+            else:
+                s.append("m %f %f " % (x, y))
+        return ''.join(s)
+
+    def toPaths(self):
+        ops = self.ops.tolist()
+        xy = self.xy.tolist()
+        arc = self.arc.tolist()
+        offsets = self.offsets.tolist()
+        paths = []
+        for i in range(len(self)):
+            path = FixedPath() if self.fixed else Path()
+            for k in range(offsets[i], offsets[i + 1]):
+                p = FixedPoint.fromGrid(xy[k][0], xy[k][1]) if self.fixed else Point(xy[k][0], xy[k][1])
+                if ops[k] == OP_LINE:
+                    path.append(line(p))
+                elif ops[k] == OP_ARC:
+                    r = arc[k][0] / FIXED_SCALE if self.fixed else arc[k][0]
+                    path.append(circleArc(r, p, '%d' % arc[k][1], '%d' % arc[k][2]))
+                elif ops[k] == OP_MOVE:
+                    path.append(Move(p))
+                else:
+                    path.append(move(p))
+            paths.append(path)
+        return paths
+
+    def compress(self, keep):
+        """returns a copy containing only the atoms where keep is True"""
+        kept = np.concatenate(([0], np.cumsum(keep)))
+        return PathArray(self.ops[keep], self.xy[keep], self.arc[keep], kept[self.offsets], self.fixed)
+
+    def pathStarts(self):
+        """mask of the first atom of every path"""
+        starts = np.zeros(len(self.ops), dtype=bool)
+        firsts = self.offsets[:-1]
+        starts[firsts[firsts < len(self.ops)]] = True
+        return starts
+
+    def positions(self):
+        """absolute end position of every atom, every path starts at the origin"""
+        anchor = (self.ops == OP_MOVE) | self.pathStarts()
+        cumulated = np.cumsum(np.where(anchor[:, None], 0, self.xy), axis=0)
+        last = np.maximum.accumulate(np.where(anchor, np.arange(len(self.ops)), 0))
+        return cumulated - cumulated[last] + self.xy[last]
+
+    def startPositions(self, pos):
+        """absolute start position of every atom given the end positions"""
+        start = np.roll(pos, 1, axis=0)
+        start[self.pathStarts()] = 0
+        return start
+
+    def withPositions(self, pos):
+        """returns a copy whose atoms end at the given absolute positions"""
+        xy = pos - self.startPositions(pos)
+        absolute = self.ops == OP_MOVE
+        xy[absolute] = pos[absolute]
+        return PathArray(self.ops, xy, self.arc.copy(), self.offsets, self.fixed)
+
+    def repeat(self, offsets):
+        """
+        returns one copy of the paths per offset (an n x 2 array), moved by the offset.
+        The paths have to start with a move.
+        """
+        offsets = np.asarray(offsets, dtype=float).reshape(-1, 2)
+        if self.fixed:
+            offsets = np.rint(offsets * FIXED_SCALE).astype(np.int64)
+        count = len(offsets)
+        n = len(self.ops)
+        shifted = (self.ops == OP_MOVE) | self.pathStarts()
+        xy = np.tile(self.xy, (count, 1)).reshape(count, n, 2)
+        xy[:, shifted] += offsets[:, None, :]
+        starts = (self.offsets[None, :-1] + n * np.arange(count)[:, None]).ravel()
+        return PathArray(np.tile(self.ops, count), xy.reshape(-1, 2), np.tile(self.arc, (count, 1)),
+                         np.append(starts, n * count).astype(np.intp), self.fixed)
+
+    def transform(self, matrices):
+        """
+        returns a copy placed by affine transforms (3 x 3, one for all paths or one per path): absolute
+        points are transformed, relative ones only rotated and arcs of mirrored paths reversed. Radii are
+        kept, so the transforms are made of translations, rotations and mirrorings (see affine).
+        """
+        matrices = np.asarray(matrices, dtype=float).reshape(-1, 3, 3)
+        owner = np.repeat(np.arange(len(self)), np.diff(self.offsets)) if len(matrices) > 1 else \
+            np.zeros(len(self.ops), dtype=np.intp)
+        scale = FIXED_SCALE if self.fixed else 1.0
+        linear = matrices[:, :2, :2]
+        # translated paths keep their relative atoms unchanged (bit for bit)
+        turned = ~np.all(linear == np.eye(2), axis=(1, 2))[owner]
+        xy = self.xy.astype(float)
+        xy[turned] = np.einsum('nij,nj->ni', linear[owner[turned]], xy[turned])
+        absolute = (self.ops == OP_MOVE) | self.pathStarts()
+        xy[absolute] += matrices[owner[absolute], :2, 2] * scale
+        arc = self.arc.copy()
+        mirrored = (np.linalg.det(linear) < 0.0)[owner] & (self.ops == OP_ARC)
+        arc[mirrored, 2] = 1 - arc[mirrored, 2]
+        if self.fixed:
+            xy = np.rint(xy).astype(np.int64)
+        return PathArray(self.ops, xy, arc, self.offsets, self.fixed)
+
+    def tangents(self, start, end):
+        """unit tangents at the start and at the end of every atom (zero for moves)"""
+        chord = end - start
+        length = np.hypot(chord[:, 0], chord[:, 1])
+        tStart = chord / np.where(length > 0.0, length, 1.0)[:, None]
+        tEnd = tStart.copy()
+        arcs = self.ops == OP_ARC
+        if arcs.any():
+            center, radius = arcCenters(start[arcs], end[arcs], self.arc[arcs])
+            turn = np.where(self.arc[arcs, 2] != 0, 1.0, -1.0)[:, None]
+            radius = np.where(radius > 0.0, radius, 1.0)[:, None]
+            for tangent, p in ((tStart, start[arcs]), (tEnd, end[arcs])):
+                v = (p - center) / radius
+                tangent[arcs] = turn * np.stack((-v[:, 1], v[:, 0]), axis=1)
+        moves = self.ops <= OP_MOVE_REL
+        tStart[moves] = 0.0
+        tEnd[moves] = 0.0
+        return tStart, tEnd
+
+    def simplify(self, epsilon=EPSILON):
+        """
+        returns a copy with segments shorter than epsilon dropped, consecutive
+        parallel lines and consecutive arcs on the same circle merged
+        (single pass, linear in the number of atoms)
+        epsilon is in grid units for fixed arrays, 0 compares exactly
+        """
+        pos = self.positions()
+        chord = pos - self.startPositions(pos)
+        arr = self.compress((self.ops <= OP_MOVE_REL) | (np.hypot(chord[:, 0], chord[:, 1]) > epsilon))
+        pos = arr.positions()
+        start = arr.startPositions(pos)
+        previous = np.roll(np.arange(len(arr.ops)), 1)
+        first = arr.pathStarts()
+
+        # lines: the end of the shorter line is within epsilon of the longer one
+        d = arr.xy
+        length = np.hypot(d[:, 0], d[:, 1])
+        cross = d[previous, 0] * d[:, 1] - d[previous, 1] * d[:, 0]
+        lines = (arr.ops == OP_LINE) & (arr.ops[previous] == OP_LINE)
+        joins = lines & (np.abs(cross) <= epsilon * np.maximum(length, length[previous]))
+
+        # arcs: same circle and same direction
+        arcs = (arr.ops == OP_ARC) & (arr.ops[previous] == OP_ARC)
+        if arcs.any():
+            center, radius, angle, extent = arcAngles(start, pos, arr.arc)
+            offCenter = np.hypot(*(center - center[previous]).T)
+            # computed centers of grid arcs are compared on the grid
+            centerTolerance = max(epsilon, 0.5) if self.fixed else epsilon
+            arcs &= (np.abs(radius - radius[previous]) <= epsilon) & (offCenter <= centerTolerance) & \
+                    (arr.arc[:, 2] == arr.arc[previous, 2])
+            joins |= arcs
+        joins &= ~first
+
+        groups = np.flatnonzero(~joins)
+        if arcs.any():
+            # an arc can not be closed to a full circle
+            total = np.add.reduceat(np.where(arr.ops == OP_ARC, extent, 0.0), groups)
+            full = np.repeat(np.abs(total) >= 2.0 * math.pi - epsilon, np.diff(np.append(groups, len(joins))))
+            joins &= ~full
+            groups = np.flatnonzero(~joins)
+            total = np.add.reduceat(np.where(arr.ops == OP_ARC, extent, 0.0), groups)
+
+        xy = np.add.reduceat(arr.xy, groups, axis=0) if len(groups) else arr.xy
+        arc = arr.arc[groups]
+        if arcs.any():
+            merged = (arr.ops[groups] == OP_ARC) & (np.diff(np.append(groups, len(joins))) > 1)
+            arc[merged, 0] = np.rint(radius[groups][merged]) if self.fixed else radius[groups][merged]
+            arc[merged, 1] = np.abs(total[merged]) > math.pi + epsilon
+        kept = np.concatenate(([0], np.cumsum(~joins)))
+        result = PathArray(arr.ops[groups], xy, arc, kept[arr.offsets], self.fixed)
+
+        # parallel lines in opposite directions may cancel out
+        empty = (result.ops >= OP_LINE) & (np.hypot(xy[:, 0], xy[:, 1]) <= epsilon)
+        return result.compress(~empty)
+
+    def flatten(self, tolerance):
+        """
+        returns a copy with all arcs replaced by lines deviating at most tolerance
+        from the arcs, the number of lines per arc depends on its radius and extent
+        """
+        arcs = self.ops == OP_ARC
+        if not arcs.any():
+            return self
+        pos = self.positions()
+        start = self.startPositions(pos)
+        center, radius, angle, extent = arcAngles(start[arcs], pos[arcs], self.arc[arcs])
+        if self.fixed:
+            tolerance = tolerance * FIXED_SCALE
+        # a chord of the angle step deviates radius * (1 - cos(step / 2)) from the arc
+        step = 2.0 * np.arccos(np.clip(1.0 - tolerance / np.where(radius > 0.0, radius, 1.0), -1.0, 1.0))
+        count = np.maximum(np.ceil(np.abs(extent) / np.maximum(step, EPSILON)), 1).astype(np.intp)
+
+        counts = np.ones(len(self.ops), dtype=np.intp)
+        counts[arcs] = count
+        owner = np.repeat(np.arange(len(self.ops)), counts)
+        k = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+        # all but the last line of an arc end on the arc, the last one at the exact end point
+        inner = arcs[owner] & (k < counts[owner])
+        arc = (np.cumsum(arcs) - 1)[owner[inner]]
+        phi = angle[arc] + extent[arc] * k[inner] / count[arc]
+        newPos = pos[owner].astype(float)
+        newPos[inner] = center[arc] + radius[arc, None] * np.stack((np.cos(phi), np.sin(phi)), axis=1)
+        if self.fixed:
+            newPos = np.rint(newPos).astype(np.int64)
+
+        ops = self.ops[owner]
+        ops[arcs[owner]] = OP_LINE
+        offsets = np.concatenate(([0], np.cumsum(counts)))[self.offsets]
+        flat = PathArray(ops, newPos, np.zeros((len(ops), 3)), offsets, self.fixed)
+        return flat.withPositions(newPos)
+
+    def chords(self, start, end, atoms, arcSegments=8):
+        """
+        straight edges approximating the given atoms (an index array)
+        returns the owning atom, start and end point of every edge, arcs are split into arcSegments chords
+        """
+        counts = np.where(self.ops[atoms] == OP_ARC, arcSegments, 1)
+        owner = np.repeat(atoms, counts)
+        e0 = start[owner]
+        e1 = end[owner]
+        arcs = self.ops[owner] == OP_ARC
+        if arcs.any():
+            k = (np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts))[arcs]
+            center, radius, angle, extent = arcAngles(e0[arcs], e1[arcs], self.arc[owner[arcs]])
+            for p, t in ((e0, k / arcSegments), (e1, (k + 1) / arcSegments)):
+                phi = angle + extent * t
+                p[arcs] = center + radius[:, None] * np.stack((np.cos(phi), np.sin(phi)), axis=1)
+        return owner, e0, e1
+
+
+def arcCenters(start, end, arc):
+    """centers and effective radii of SVG circle arcs (rows of PathArray.arc) from start to end"""
+    chord = end - start
+    length = np.hypot(chord[:, 0], chord[:, 1])
+    # SVG scales up radii which are too small to reach the end point
+    radius = np.maximum(arc[:, 0], length / 2.0)
+    h = np.sqrt(np.maximum(radius ** 2 - (length / 2.0) ** 2, 0.0))
+    left = np.stack((-chord[:, 1], chord[:, 0]), axis=1) / np.where(length > 0.0, length, 1.0)[:, None]
+    side = np.where(arc[:, 1] != arc[:, 2], 1.0, -1.0)
+    return (start + end) / 2.0 + (side * h)[:, None] * left, radius
+
+
+def arcAngles(start, end, arc):
+    """centers, radii, start angles and signed angular extents of SVG circle arcs"""
+    center, radius = arcCenters(start, end, arc)
+    angle = np.arctan2(start[:, 1] - center[:, 1], start[:, 0] - center[:, 0])
+    extent = np.mod(np.arctan2(end[:, 1] - center[:, 1], end[:, 0] - center[:, 0]) - angle, 2.0 * math.pi)
+    return center, radius, angle, np.where(arc[:, 2] != 0, extent, extent - 2.0 * math.pi)
+
+
+def circlePath(r, center):
+    """a circle as path of two half circles"""
+    path = Path()
+    path.MoveTo(center.add(r, 0))
+    path.append(circleArc(r, Point(-2 * r, 0), '0', '1'))
+    path.append(circleArc(r, Point(2 * r, 0), '0', '1'))
+    return path
+
+
+def livingHingeSlits(start, width, length, slitLength, gap, pitch):
+    """
+    the slits of a living hinge in the area width x length at start as one compound PathArray:
+    rows of slits across the width, pitch apart, every other row shifted by half a slit.
+    Slits keep a border of gap to the sides, shorter stubs are dropped.
+    """
+    period = slitLength + gap
+    rows = np.arange(max(int(math.floor(length / pitch)), 0))
+    half = int(math.ceil(width / (2.0 * period))) + 1
+    k = np.arange(-half, half + 1)
+    centers = width / 2.0 + k[None, :] * period + (rows[:, None] % 2) * (period / 2.0)
+    x0 = np.clip(centers - slitLength / 2.0, gap, width - gap)
+    x1 = np.clip(centers + slitLength / 2.0, gap, width - gap)
+    # odd rows are cut backwards, the head moves in a serpentine
+    odd = rows % 2 == 1
+    x0[odd], x1[odd] = x1[odd, ::-1], x0[odd, ::-1]
+    y = np.broadcast_to(start.y + (rows[:, None] + 0.5) * pitch, centers.shape)
+    keep = np.abs(x1 - x0) >= gap
+    x0, x1, y = x0[keep], x1[keep], y[keep]
+
+    n = len(x0)
+    xy = np.zeros((2 * n, 2))
+    xy[0::2, 0] = start.x + x0
+    xy[0::2, 1] = y
+    xy[1::2, 0] = x1 - x0
+    ops = np.tile(np.array([OP_MOVE, OP_LINE], dtype=np.uint8), n)
+    return PathArray(ops, xy, np.zeros((2 * n, 3)), np.array([0, 2 * n], dtype=np.intp))
+
+
+def dividerOutline(length, height, slots, slotWidth, fromTop):
+    """
+    the outline of a divider (length x height, starting at the origin) as PathArray.
+    It has a slot of slotWidth and half the height at every position in slots,
+    cut from the top or from the bottom edge, so crossing dividers interlock.
+    """
+    slots = np.sort(np.asarray(slots, dtype=float))
+    half = height / 2.0
+    # corners of the slots in the order they are passed along the edge
+    x = np.stack((slots, slots, slots + slotWidth, slots + slotWidth), axis=1)
+    if fromTop:
+        y = np.broadcast_to([0.0, half, half, 0.0], x.shape)
+        corners = [[(0.0, 0.0)], np.stack((x, y), axis=2).reshape(-1, 2), [(length, 0.0), (length, height),
+                                                                           (0.0, height), (0.0, 0.0)]]
+    else:
+        y = np.broadcast_to([height, half, half, height], x.shape)
+        edge = np.stack((x[::-1, ::-1], y), axis=2).reshape(-1, 2)
+        corners = [[(0.0, 0.0), (length, 0.0), (length, height)], edge, [(0.0, height), (0.0, 0.0)]]
+    corners = np.concatenate([np.asarray(c, dtype=float).reshape(-1, 2) for c in corners])
+    n = len(corners)
+    xy = np.concatenate((corners[:1], np.diff(corners, axis=0)))
+    ops = np.full(n, OP_LINE, dtype=np.uint8)
+    ops[0] = OP_MOVE
+    return PathArray(ops, xy, np.zeros((n, 3)), np.array([0, n], dtype=np.intp))
+
+
+class Part:
+    """
+    a generated element: a path (Path or PathArray) or, if path is None, a circle.
+    transform is the placement (see affine) of a part in its local frame, None if placed already.
+    """
+
+    def __init__(self, path, color='black', r=None, center=None, transform=None):
+        self.path = path
+        self.color = color
+        self.r = r
+        self.center = center
+        self.transform = transform
+
+
+def partsExtent(parts):
+    """the maximum coordinates of the parts (at least zero), arcs are only taken by their end points"""
+    extent = np.zeros(2)
+    paths = [part.path for part in parts if part.path is not None]
+    if paths:
+        extent = np.maximum(extent, PathArray.fromPaths(paths).toFloat().positions().max(axis=0, initial=0.0))
+    for part in parts:
+        if part.path is None:
+            extent = np.maximum(extent, (part.center.x + part.r, part.center.y + part.r))
+    return extent
+
+
+def affine(dx=0.0, dy=0.0, quarterTurns=0, mirror=False):
+    """
+    the 3 x 3 matrix placing a part: mirrored at the y axis (x to -x) if mirror, turned by quarterTurns
+    times 90 degrees (from the x to the y axis) and moved by dx, dy. Placements combine with @.
+    """
+    cos, sin = ((1, 0), (0, 1), (-1, 0), (0, -1))[quarterTurns % 4]
+    return np.array([[cos, -sin, dx], [sin, cos, dy], [0, 0, 1]], dtype=float) @ \
+           np.diag([-1.0 if mirror else 1.0, 1.0, 1.0])
+
+
+def localParts(parts):
+    """
+    the parts in their local frame, starting at the origin, and placed by a translation (Part.transform)
+    to where they were. Only the first moves change, the parts are drawn relative to them.
+    """
+    paths = [part.path for part in parts if part.path is not None]
+    local = iter([])
+    if paths:
+        arr = PathArray.fromPaths(paths)
+        starts = arr.offsets[:-1]
+        origins = np.where((arr.ops[starts] <= OP_MOVE_REL)[:, None], arr.xy[starts], 0.0)
+        owner = np.repeat(np.arange(len(arr)), np.diff(arr.offsets))
+        absolute = (arr.ops == OP_MOVE) | arr.pathStarts()
+        xy = arr.xy.copy()
+        xy[absolute] -= origins[owner[absolute]]
+        local = iter(zip(PathArray(arr.ops, xy, arr.arc, arr.offsets).split(), origins.tolist()))
+    result = []
+    for part in parts:
+        if part.path is None:
+            result.append(Part(None, part.color, part.r, Point(0.0, 0.0), affine(part.center.x, part.center.y)))
+        else:
+            path, (x, y) = next(local)
+            result.append(Part(path, part.color, transform=affine(x, y)))
+    return result
+
+
+def svgTransform(matrix):
+    """the svg transform attribute of a placement"""
+    if np.all(matrix[:2, :2] == np.eye(2)):
+        return 'translate(%f,%f)' % (matrix[0, 2], matrix[1, 2])
+    return 'matrix(%f,%f,%f,%f,%f,%f)' % tuple(matrix[:2].T.ravel().tolist())
+
+
+def placeParts(parts):
+    """the parts placed by their transforms, in one vectorized multiply for all paths"""
+    paths = [part for part in parts if part.path is not None]
+    placed = iter([])
+    if paths:
+        arr = PathArray.fromPaths([part.path for part in paths])
+        placed = iter(arr.transform([part.transform for part in paths]).split())
+    result = []
+    for part in parts:
+        if part.path is None:
+            x, y, w = part.transform @ (part.center.x, part.center.y, 1.0)
+            result.append(Part(None, part.color, part.r, Point(x, y)))
+        else:
+            result.append(Part(next(placed), part.color))
+    return result
+
+
+def cutMetrics(parts, head=(0.0, 0.0)):
+    """
+    cut length (lines and arcs), number of pierces and travel distance of every part, in one pass over
+    the atoms. The head travels from head through the parts in their order, a circle is pierced and
+    ends at its right. Returns the three arrays and the final position of the head.
+    """
+    if not parts:
+        return np.zeros(0), np.zeros(0, dtype=np.intp), np.zeros(0), np.asarray(head, dtype=float)
+    arr = partsArray(parts)
+    pos = arr.positions()
+    start = arr.startPositions(pos)
+    owner = np.repeat(np.arange(len(parts)), np.diff(arr.offsets))
+
+    moves = arr.ops <= OP_MOVE_REL
+    # moves start from the end of the atom before, the first one from the head
+    previous = np.roll(pos, 1, axis=0)
+    previous[0] = head
+    travel = np.where(moves, np.hypot(*(pos - previous).T), 0.0)
+    length = np.where(arr.ops == OP_LINE, np.hypot(*arr.xy.T), 0.0)
+    arcs = arr.ops == OP_ARC
+    if arcs.any():
+        center, radius, angle, extent = arcAngles(start[arcs], pos[arcs], arr.arc[arcs])
+        length[arcs] = radius * np.abs(extent)
+    pierces = ~moves & (np.roll(moves, 1) | arr.pathStarts())
+
+    count = len(parts)
+    return (np.bincount(owner, length, count), np.bincount(owner, pierces, count).astype(np.intp),
+            np.bincount(owner, travel, count), pos[-1])
+
+
+def flattenParts(parts, tolerance):
+    """returns the parts as polylines, circles and arcs are flattened with the given chord tolerance"""
+    flat = partsArray(parts).flatten(tolerance).split()
+    return [Part(path, part.color) for path, part in zip(flat, parts)]
+
+
+def partsArray(parts):
+    """
+    the paths of all parts as one float PathArray in their order, circles as paths of two half circles.
+    The paths of the parts are converted only if they are not the views of one array already.
+    """
+    paths = [part.path for part in parts if part.path is not None]
+    circles = [circlePath(part.r, part.center) for part in parts if part.path is None]
+    if not circles:
+        return PathArray.fromPaths(paths).toFloat()
+    if not paths:
+        return PathArray.fromPaths(circles)
+    isCircle = np.array([part.path is None for part in parts])
+    # the paths come first, then the circles
+    order = np.empty(len(parts), dtype=np.intp)
+    order[~isCircle] = np.arange(len(paths))
+    order[isCircle] = np.arange(len(paths), len(parts))
+    return PathArray.concatenate([PathArray.fromPaths(paths).toFloat(), PathArray.fromPaths(circles)]).take(order)
+
+
+def rightNormals(tangents):
+    return np.stack((tangents[:, 1], -tangents[:, 0]), axis=1)
+
+
+def bisectors(nIn, nOut):
+    """offset of a vertex between segments with the normals nIn and nOut per unit offset (mitered)"""
+    return (nIn + nOut) / np.maximum(1.0 + (nIn * nOut).sum(axis=1), 0.1)[:, None]
+
+
+# open contours whose gap is below this fraction of their size are treated as closed
+MAX_GAP_RATIO = 0.1
+
+
+def nonEmptySegments(arr):
+    """the array without segments of zero length, which have no direction"""
+    pos = arr.positions()
+    chord = pos - arr.startPositions(pos)
+    return arr.compress((arr.ops <= OP_MOVE_REL) | (np.hypot(chord[:, 0], chord[:, 1]) > EPSILON))
+
+
+def boxPairs(points, lo, hi):
+    """
+    the pairs (point index, box index) of the points lying within the boxes (lo, hi), found through a
+    grid of about as many cells as boxes: linear in the number of points and boxes covering their cells
+    """
+    if not len(points) or not len(lo):
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    origin = np.minimum(lo.min(axis=0), points.min(axis=0))
+    size = np.maximum(hi.max(axis=0), points.max(axis=0)) - origin
+    cells = max(int(math.sqrt(len(lo))), 1)
+    cellSize = np.maximum(size / cells, EPSILON)
+
+    def cellOf(p):
+        return np.clip(((p - origin) // cellSize).astype(np.intp), 0, cells - 1)
+
+    c0 = cellOf(lo)
+    c1 = cellOf(hi)
+    span = c1 - c0 + 1
+    counts = span[:, 0] * span[:, 1]
+    box = np.repeat(np.arange(len(lo)), counts)
+    k = np.arange(len(box)) - np.repeat(np.cumsum(counts) - counts, counts)
+    boxCells = (c0[box, 0] + k % span[box, 0]) * cells + c0[box, 1] + k // span[box, 0]
+    order = np.argsort(boxCells, kind='stable')
+    boxCells, box = boxCells[order], box[order]
+
+    pointCells = cellOf(points)
+    pointCells = pointCells[:, 0] * cells + pointCells[:, 1]
+    first = np.searchsorted(boxCells, pointCells, side='left')
+    counts = np.searchsorted(boxCells, pointCells, side='right') - first
+    point = np.repeat(np.arange(len(points)), counts)
+    box = box[np.arange(len(point)) - np.repeat(np.cumsum(counts) - counts, counts) + first[point]]
+    inside = np.all((points[point] >= lo[box]) & (points[point] <= hi[box]), axis=1)
+    return point[inside], box[inside]
+
+
+class Contours:
+    """
+    the contours of a PathArray without empty segments (pos and start are the positions of its atoms)
+    and the circles of circleParts: which contours are closed, their orientation (sign of their area)
+    and their nesting depth (holes lie inside of an odd number of other contours or circles)
+    """
 
-        self.frameEdgesMin = self.svg.unittouu(str(self.options.frameEdgesMin) + unit)
-        self.frameLength = self.svg.unittouu(str(self.options.frameLength) + unit)
-        self.hingeCircleFactor = self.options.hingeCircleFactor
+    def __init__(self, arr, pos, start, circleParts):
+        # a contour starts with a move (or at the start of a path)
+        first = (arr.ops <= OP_MOVE_REL) | arr.pathStarts()
+        contour = np.cumsum(first) - 1
+        firstIdx = np.flatnonzero(first)
+        lastIdx = np.append(firstIdx[1:], len(arr.ops))[:len(firstIdx)] - 1
+        firstSegment = np.minimum(firstIdx + 1, lastIdx)
+
+        # a contour is closed if it ends at its start, on its first line (overlapping it)
+        # or close to its start, the gap is then bridged by a straight line
+        gap = pos[firstIdx] - pos[lastIdx]
+        gapLength = np.hypot(gap[:, 0], gap[:, 1])
+        along = pos[firstSegment] - pos[firstIdx]
+        alongLength = np.hypot(along[:, 0], along[:, 1])
+        projection = -(gap * along).sum(axis=1) / np.where(alongLength > 0.0, alongLength, 1.0)
+        extent = np.zeros(len(firstIdx))
+        if len(firstIdx):
+            size = np.maximum.reduceat(pos, firstIdx) - np.minimum.reduceat(pos, firstIdx)
+            extent = size.max(axis=1)
+        exact = gapLength < EPSILON
+        overlap = ~exact & (arr.ops[firstSegment] == OP_LINE) & (projection > 0.0) & (projection < alongLength) & \
+                  (np.abs(gap[:, 0] * along[:, 1] - gap[:, 1] * along[:, 0]) < EPSILON * alongLength)
+        bridged = ~exact & ~overlap & (gapLength < MAX_GAP_RATIO * extent)
+        closed = (arr.ops[firstIdx] <= OP_MOVE_REL) & (lastIdx - firstIdx >= 2) & (exact | overlap | bridged)
+        overlap &= closed
+        bridged &= closed
+
+        edges = ~first & closed[contour]
+        owner, e0, e1 = arr.chords(start, pos, np.flatnonzero(edges))
+        closing = np.flatnonzero(overlap | bridged)
+        owner = np.concatenate((owner, lastIdx[closing]))
+        order = np.argsort(owner, kind='stable')
+        owner = owner[order]
+        e0 = np.concatenate((e0, pos[lastIdx[closing]]))[order]
+        e1 = np.concatenate((e1, pos[firstIdx[closing]]))[order]
+        cross = e0[:, 0] * e1[:, 1] - e1[:, 0] * e0[:, 1]
+        orientation = np.sign(np.bincount(contour[owner], weights=cross, minlength=len(firstIdx)))
+        orientation[orientation == 0.0] = 1.0
+
+        # nesting depth by ray casting, each sample only against the contours and circles whose bounds hold it
+        closedIdx = np.flatnonzero(closed)
+        rank = np.cumsum(closed) - 1
+        centers = np.array([(part.center.x, part.center.y) for part in circleParts], dtype=float).reshape(-1, 2)
+        radii = np.array([part.r for part in circleParts], dtype=float)
+        samples = np.concatenate((pos[firstIdx[closedIdx]], centers))
+        groups = np.flatnonzero(np.diff(np.concatenate(([-1], rank[contour[owner]]))))
+        depth = np.zeros(len(samples), dtype=int)
+        if len(groups):
+            lo = np.minimum.reduceat(np.minimum(e0, e1), groups)
+            hi = np.maximum.reduceat(np.maximum(e0, e1), groups)
+            point, box = boxPairs(samples, lo, hi)
+            keep = point != box
+            point, box = point[keep], box[keep]
+            # the edges of the contour of every pair
+            counts = np.diff(np.append(groups, len(owner)))[box]
+            pair = np.repeat(np.arange(len(point)), counts)
+            edge = np.arange(len(pair)) - np.repeat(np.cumsum(counts) - counts, counts) + groups[box][pair]
+            px, py = samples[point[pair]].T
+            x0, y0 = e0[edge].T
+            x1, y1 = e1[edge].T
+            xCross = x0 + (py - y0) * (x1 - x0) / np.where(y1 != y0, y1 - y0, 1.0)
+            hits = np.bincount(pair, ((y0 > py) != (y1 > py)) & (px < xCross), len(point))
+            np.add.at(depth, point[hits % 2 == 1], 1)
+        if len(radii):
+            point, circle = boxPairs(samples, centers - radii[:, None], centers + radii[:, None])
+            keep = (point != circle + len(closedIdx)) & \
+                   (np.hypot(*(samples[point] - centers[circle]).T) < radii[circle])
+            np.add.at(depth, point[keep], 1)
+        self.first = first
+        self.contour = contour
+        self.firstIdx = firstIdx
+        self.lastIdx = lastIdx
+        self.firstSegment = firstSegment
+        self.gap = gap
+        self.gapLength = gapLength
+        self.closed = closed
+        self.overlap = overlap
+        self.bridged = bridged
+        self.orientation = orientation
+        self.closedIdx = closedIdx
+        self.depth = depth
+        self.edges = edges
+        self.radii = radii
+
+    def materialLeft(self):
+        """for every contour if it is closed and its material lies on its left (holes have their material outside)"""
+        left = np.zeros(len(self.firstIdx), dtype=bool)
+        hole = self.depth[:len(self.closedIdx)] % 2 == 1
+        left[self.closedIdx] = np.where(hole, -1.0, 1.0) * self.orientation[self.closedIdx] > 0.0
+        return left
+
+
+def kerfCompensate(parts, kerf):
+    """
+    returns the parts compensated for the width of the cut (kerf)
+    Closed contours are offset by kerf/2 outward, holes (contours lying inside
+    of an odd number of other contours, e.g. slots, usb cut-outs and hinge
+    circles) inward. Open paths are returned unchanged.
+    Corners between lines are mitered, arcs stay concentric.
+    """
+    distance = kerf / 2.0
+    pathParts = [part for part in parts if part.path is not None]
+    circleParts = [part for part in parts if part.path is None]
+
+    arr = nonEmptySegments(PathArray.fromPaths([part.path for part in pathParts]))
+    pos = arr.positions()
+    start = arr.startPositions(pos)
+    tStart, tEnd = arr.tangents(start, pos)
+
+    contours = Contours(arr, pos, start, circleParts)
+    contour, firstIdx, lastIdx, firstSegment = contours.contour, contours.firstIdx, contours.lastIdx, contours.firstSegment
+    gap, gapLength, overlap, bridged = contours.gap, contours.gapLength, contours.overlap, contours.bridged
+    closedIdx, edges = contours.closedIdx, contours.edges
+    outward = np.where(contours.depth % 2 == 1, -distance, distance)
+
+    # move every vertex along the bisector of the adjacent offset segments
+    offset = np.zeros(len(firstIdx))
+    offset[closedIdx] = outward[:len(closedIdx)] * contours.orientation[closedIdx]
+    nFirst = rightNormals(tStart[firstSegment])
+    nClose = rightNormals(gap / np.where(gapLength > 0.0, gapLength, 1.0)[:, None])
+    segments = np.flatnonzero(edges)
+    c = contour[segments]
+    isLast = segments == lastIdx[c]
+    nOut = rightNormals(tStart[np.where(isLast, segments, segments + 1)])
+    nOut[isLast] = np.where(bridged[c[isLast], None], nClose[c[isLast]], nFirst[c[isLast]])
+    newPos = pos.copy()
+    newPos[segments] += offset[c, None] * bisectors(rightNormals(tEnd[segments]), nOut)
+    starts = firstIdx[closedIdx]
+    newPos[starts] = newPos[lastIdx[closedIdx]]
+    newPos[firstIdx[overlap]] = pos[firstIdx[overlap]] + offset[overlap, None] * nFirst[overlap]
+    newPos[firstIdx[bridged]] = pos[firstIdx[bridged]] + offset[bridged, None] * \
+                                bisectors(nClose[bridged], nFirst[bridged])
+
+    result = arr.withPositions(newPos)
+    arcs = edges & (arr.ops == OP_ARC)
+    turn = np.where(arr.arc[arcs, 2] != 0, 1.0, -1.0)
+    radius = np.maximum(arr.arc[arcs, 0], np.hypot(*(pos[arcs] - start[arcs]).T) / 2.0)
+    result.arc[arcs, 0] = np.maximum(radius + offset[contour[arcs]] * turn, EPSILON)
+
+    paths = iter(result.split())
+    circleRadii = iter(np.maximum(contours.radii + outward[len(closedIdx):], EPSILON).tolist())
+    compensated = []
+    for part in parts:
+        if part.path is None:
+            compensated.append(Part(None, part.color, next(circleRadii), part.center))
+        else:
+            compensated.append(Part(next(paths), part.color))
+    return compensated
 
-        self.debug = self.options.debug
+
+def concaveCorners(arr, contours):
+    """
+    the corners between two lines of the closed contours, classified in one pass by the turn between
+    the lines and the side of the material: the indices of the lines into and out of every corner and
+    if it is concave (the contour turns away from its material)
+    """
+    count = len(arr.ops)
+    following = np.arange(1, count + 1)
+    # the last line of a contour ending exactly at its start continues with its first line
+    exact = contours.closed & ~contours.overlap & ~contours.bridged
+    following[contours.lastIdx[exact]] = contours.firstSegment[exact]
+    following = np.minimum(following, count - 1)
+    contour = contours.contour
+    # a line running back along the line before or after it (e.g. the last line of a contour ending on its
+    # first line) is a spike of no width, its corners are no real ones: of two antiparallel lines the shorter
+    backtrack = np.zeros(count, dtype=bool)
+    backtrack[contours.lastIdx[contours.overlap]] = True
+    pair = np.flatnonzero((arr.ops == OP_LINE) & (arr.ops[following] == OP_LINE) & (following != np.arange(count)))
+    a = arr.xy[pair]
+    b = arr.xy[following[pair]]
+    lengthA = np.hypot(*a.T)
+    lengthB = np.hypot(*b.T)
+    spike = (np.abs(a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]) <= EPSILON * lengthA * lengthB) & ((a * b).sum(axis=1) < 0.0)
+    backtrack[np.where(lengthA <= lengthB, pair, following[pair])[spike]] = True
+    inIdx = np.flatnonzero((arr.ops == OP_LINE) & (arr.ops[following] == OP_LINE) & contours.closed[contour] &
+                           (contour[following] == contour) & (following != np.arange(count)) &
+                           ~backtrack & ~backtrack[following])
+    outIdx = following[inIdx]
+    a = arr.xy[inIdx]
+    b = arr.xy[outIdx]
+    turn = a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+    straight = np.abs(turn) <= EPSILON * np.hypot(*a.T) * np.hypot(*b.T)
+    concave = ~straight & np.where(contours.materialLeft()[contour[inIdx]], turn < 0.0, turn > 0.0)
+    return inIdx, outIdx, concave
+
+
+def reliefCorners(parts, radius, style='dogbone'):
+    """
+    returns the parts with relief cuts at the concave corners, which a round tool of the given radius
+    can not reach (CNC routing): 'dogbone' cuts through the corner along its bisector, 'tbone' along
+    the longer of its two lines. Convex corners, open paths, arcs and circles stay unchanged.
+    The reliefs of the two corners of a short line (e.g. the bottom of a slot) which overlap are joined
+    where their circles meet, corners whose relief does not fit on their lines or where the tool does
+    not fit between them (a tool as large as the material thickness) are left without.
+    Linear in the number of atoms.
+    """
+    pathParts = [part for part in parts if part.path is not None]
+    circleParts = [part for part in parts if part.path is None]
+    arr = nonEmptySegments(PathArray.fromPaths([part.path for part in pathParts]))
+    pos = arr.positions()
+    contours = Contours(arr, pos, arr.startPositions(pos), circleParts)
+    inIdx, outIdx, concave = concaveCorners(arr, contours)
+    inIdx, outIdx = inIdx[concave], outIdx[concave]
+
+    count = len(arr.ops)
+    length = np.hypot(*arr.xy.T)
+    a = arr.xy[inIdx] / length[inIdx, None]
+    b = arr.xy[outIdx] / length[outIdx, None]
+    sweep = (a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]) > 0.0
+    if style == 'tbone':
+        # a half circle centered on the longer line, through the corner
+        alongOut = (length[outIdx] >= length[inIdx])[:, None]
+        cutIn = np.where(alongOut, 0.0, 2.0 * radius)
+        cutOut = np.where(alongOut, 2.0 * radius, 0.0)
+        center = np.where(alongOut, b, -a) * radius
+        largeArc = np.zeros(len(inIdx), dtype=bool)
+    else:
+        # a circle centered on the bisector, through the corner: it cuts 2 r sin(turn / 2) off both lines
+        e = b - a
+        e /= np.maximum(np.hypot(*e.T), EPSILON)[:, None]
+        cutIn = -2.0 * radius * (a * e).sum(axis=1)[:, None]
+        cutOut = 2.0 * radius * (b * e).sum(axis=1)[:, None]
+        center = e * radius
+        largeArc = (a * b).sum(axis=1) < -EPSILON
+
+    # a relief longer than its line does not fit, nor do two reliefs overlapping on a line narrower
+    # than the tool (as does the second corner of such a line)
+    fits = (cutIn[:, 0] <= length[inIdx] + EPSILON) & (cutOut[:, 0] <= length[outIdx] + EPSILON)
+    while True:
+        cut = np.bincount(inIdx[fits], cutIn[fits, 0], count) + np.bincount(outIdx[fits], cutOut[fits, 0], count)
+        overlapping = cut > length + EPSILON
+        narrow = overlapping & (length < 2.0 * radius - EPSILON)
+        dropped = fits & (narrow[inIdx] | narrow[outIdx])
+        if not dropped.any():
+            break
+        fits &= ~dropped
+    inIdx, outIdx, a, b, sweep, largeArc = inIdx[fits], outIdx[fits], a[fits], b[fits], sweep[fits], largeArc[fits]
+    cutIn, cutOut, center = cutIn[fits], cutOut[fits], center[fits]
+
+    # start and end of the relief arcs relative to their corner
+    arcStart = -cutIn * a
+    arcEnd = cutOut * b
+    joined = np.flatnonzero(overlapping)
+    if len(joined):
+        # the corner before (ending at the start of the line) and after a joined line
+        before = np.full(count, -1)
+        before[outIdx] = np.arange(len(outIdx))
+        after = np.full(count, -1)
+        after[inIdx] = np.arange(len(inIdx))
+        q, p = before[joined], after[joined]
+        cornerQ = pos[inIdx[q]]
+        cQ = cornerQ + center[q]
+        cP = pos[joined] + center[p]
+        d = cP - cQ
+        distance = np.maximum(np.hypot(*d.T), EPSILON)[:, None]
+        h = np.sqrt(np.maximum(radius ** 2 - (distance / 2.0) ** 2, 0.0))
+        across = np.stack((-d[:, 1], d[:, 0]), axis=1) / distance
+        # of the two points where the circles meet the one behind the line, away from the centers
+        joinedXY = arr.xy[joined]
+        side = np.sign(joinedXY[:, 0] * center[q, 1] - joinedXY[:, 1] * center[q, 0])[:, None]
+        behind = np.sign((joinedXY[:, 0] * across[:, 1] - joinedXY[:, 1] * across[:, 0]))[:, None] * side
+        meet = (cQ + cP) / 2.0 + np.where(behind <= 0.0, h, -h) * across
+        arcEnd[q] = meet - cornerQ
+        arcStart[p] = meet - pos[joined]
+        changed = np.union1d(q, p)
+        u = arcStart[changed] - center[changed]
+        v = arcEnd[changed] - center[changed]
+        angle = np.arctan2(u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0], (u * v).sum(axis=1))
+        largeArc[changed] = np.mod(np.where(sweep[changed], angle, -angle), 2.0 * math.pi) > math.pi
+
+    xy = arr.xy.copy()
+    xy[inIdx] += arcStart
+    xy[outIdx] -= arcEnd
+    # the corner at the start of a contour moves its start
+    closing = outIdx != inIdx + 1
+    xy[outIdx[closing] - 1] += arcEnd[closing]
+
+    at = inIdx + 1
+    order = np.argsort(at, kind='stable')
+    ops = np.insert(arr.ops, at, OP_ARC)
+    xy = np.insert(xy, at, arcEnd - arcStart, axis=0)
+    arc = np.insert(arr.arc, at, np.stack((np.full(len(at), float(radius)), largeArc, sweep), axis=1), axis=0)
+    offsets = arr.offsets + np.searchsorted(at[order], arr.offsets, side='right')
+    # the joined lines are covered by the arcs
+    keep = np.ones(count, dtype=bool)
+    keep[joined] = False
+    keep = np.insert(keep, at, True)
+    paths = iter(PathArray(ops, xy, arc, offsets).compress(keep).split())
+    return [part if part.path is None else Part(next(paths), part.color) for part in parts]
+
+
+class BoxParameters(namedtuple('BoxParameters', [
+    'boxType', 'boxWidth', 'boxDepth', 'boxHeight', 'thickness', 'shelfCount', 'frameEdgesMin', 'frameLength',
+    'hingeCircleFactor', 'slitLength', 'slitGap', 'slitPitch', 'hingeLength', 'gridColumns', 'gridRows', 'kerf',
+    'fixedPoint', 'outputMode', 'chordTolerance', 'debug', 'lineWidth', 'markerWidth', 'cutSpeed', 'travelSpeed',
+    'pierceTime', 'cornerRelief', 'toolRadius', 'placement'],
+        defaults=['withHinge', 200.0, 100.0, 70.0, 4.0, 1, 5.0, 10.0, 1.5, 20.0, 3.0, 2.0, 30.0, 3, 2, 0.0,
+                  False, 'arcs', 0.01, False, 0.1, 2.0, 20.0, 200.0, 0.5, 'none', 1.5, 'coordinates'])):
+    """
+    the immutable parameters of a generation run, lengths in user units of the document
+    (lineWidth and markerWidth are the stroke widths of cuts and debug markers).
+    cutSpeed and travelSpeed are the feed rates (user units per second) and pierceTime the seconds
+    per pierce of the machine time estimate. cornerRelief ('none', 'dogbone' or 'tbone') cuts the
+    concave corners for a router of toolRadius. placement 'transform' writes the parts in their local
+    frame with a transform attribute instead of placed coordinates.
+    """
+    __slots__ = ()
+
+
+# the values of the parameters taking one of a set of names
+parameterChoices = {'boxType': tuple(boxTypes), 'outputMode': ('arcs', 'polylines'),
+                    'cornerRelief': ('none', 'dogbone', 'tbone'), 'placement': ('coordinates', 'transform')}
+
+
+def parametersFromJson(data):
+    """
+    BoxParameters of a JSON object, raises ValueError for unknown fields, values of the wrong type
+    and names not in parameterChoices
+    """
+    if not isinstance(data, dict):
+        raise ValueError('the parameters have to be a JSON object')
+    unknown = sorted(set(data) - set(BoxParameters._fields))
+    if unknown:
+        raise ValueError('unknown parameters: %s' % ', '.join(unknown))
+    values = {}
+    for name, value in data.items():
+        default = BoxParameters._field_defaults[name]
+        if isinstance(default, bool):
+            valid = isinstance(value, bool)
+        elif isinstance(default, int):
+            valid = isinstance(value, int) and not isinstance(value, bool)
+        elif isinstance(default, float):
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+            value = float(value) if valid else value
+        else:
+            valid = isinstance(value, str)
+        if not valid:
+            raise ValueError('%s has to be of type %s' % (name, type(default).__name__))
+        if name in parameterChoices and value not in parameterChoices[name]:
+            raise ValueError('%s has to be one of %s' % (name, ', '.join(parameterChoices[name])))
+        values[name] = value
+    return BoxParameters(**values)
+
+
+class BoxGenerator:
+    """
+    one generation run: draws the box given by the parameters into its own list of elements.
+    Runs share no mutable state, so several can generate concurrently.
+    """
+
+    def __init__(self, params=BoxParameters(), date=None):
+        self.params = params
+        self.boxType = boxTypes.get(params.boxType, withHinge)
+        self.boxWidth = params.boxWidth
+        self.boxDepth = params.boxDepth
+        self.boxHeight = params.boxHeight
+        self.thickness = params.thickness
+        self.shelfcount = params.shelfCount
+
+        self.frameEdgesMin = params.frameEdgesMin
+        self.frameLength = params.frameLength
+        self.hingeCircleFactor = params.hingeCircleFactor
+        self.kerf = params.kerf
+        self.fixedPoint = params.fixedPoint
+        self.outputMode = params.outputMode
+        self.chordTolerance = params.chordTolerance
+        self.slitLength = params.slitLength
+        self.slitGap = params.slitGap
+        self.slitPitch = params.slitPitch
+        self.hingeLength = params.hingeLength
+        self.gridColumns = params.gridColumns
+        self.gridRows = params.gridRows
+        self.debug = params.debug
+        self.lineWidth = params.lineWidth
+        self.markerWidth = params.markerWidth
+        self.cutSpeed = params.cutSpeed
+        self.travelSpeed = params.travelSpeed
+        self.pierceTime = params.pierceTime
+        self.cornerRelief = params.cornerRelief
+        self.toolRadius = params.toolRadius
+        self.placement = params.placement
 
         self.backRestHeight = 150.0
         self.backRestWidth = 90.0
@@ -398,21 +1499,84 @@ class BoxMaker(inkex.Effect):
         self.inclination = 75.0
         self.inclinationRad = self.inclination * math.pi / 180.0
 
-        # inkex.debug("Info. %.2f %.2f %s %.2f" % (self.boxWidth, self.frameLength, repr(self.debug), self.hingeCircleFactor))
-
-        self.parent = self.svg.get_current_layer()
-
+        self.date = datetime.now() if date is None else date
+        self.markerCount = 0
+        self.parts = []
+        # (tag, attributes, text) of the generated svg elements, None in the place of a part not written yet
+        self.elements = []
+        # the written parts in their local frame with their placement, for a new layout
+        self.placed = []
+        # lower right corner of the written parts
+        self.extent = np.zeros(2)
+        # (color, cut length, pierces, travel) of the written parts, the head ends at headPosition
+        self.cuts = []
+        self.headPosition = np.zeros(2)
+        # index of the info text in elements, completed with the cut metrics
+        self.infoIndex = None
+        # the style attributes of the cuts by color and line width
+        self.styles = {}
+
+    def generate(self):
+        """draws the box, returns the generated elements"""
         self.drawBox()
-        #    inkex.debug("Dict up " + repr( Direction.up['walkIn'][0]))
-
-        #    inkex.debug('date %s' % self.printDate(datetime.now()))
-        #    self.markPoints(Point(5.0,5.0), 'green')
-        #    inkex.debug('boxFrame %s'%self.boxFrames(Point(40.0,40.0), 100.0, Direction.down, False).translateToSVGd())
-        #    self.insertPath(self.boxFrames(Point(40.0,40.0), 100.0, Direction.down, False))
-
         if self.boxType == mobileLoader:
             self.drawMobileLoader()
 
+        self.flushParts()
+        if self.infoIndex is not None:
+            total = self.metrics()['total']
+            tag, attributes, text = self.elements[self.infoIndex]
+            self.elements[self.infoIndex] = (tag, attributes, text + \
+                " --- cut length: %.0fmm, pierces: %d, travel: %.0fmm, machine time: %d:%02d min" % \
+                (total['cutLength'], total['pierces'], total['travel'], total['time'] // 60, total['time'] % 60))
+        return self.elements
+
+    def writeMetrics(self, fileName):
+        """writes the metrics as JSON sidecar file"""
+        with open(fileName, 'w') as out:
+            json.dump(self.metrics(), out, indent=1)
+
+    def machineTime(self, cutLength, pierces, travel):
+        """estimated machine time in seconds"""
+        return cutLength / self.cutSpeed + travel / self.travelSpeed + pierces * self.pierceTime
+
+    def metrics(self):
+        """cut length, pierces, travel and machine time of the written parts: per part, per color and in total"""
+
+        def summary(cutLength, pierces, travel):
+            return {'cutLength': cutLength, 'pierces': pierces, 'travel': travel,
+                    'time': self.machineTime(cutLength, pierces, travel)}
+
+        parts = []
+        colors = {}
+        total = [0.0, 0, 0.0]
+        for color, cutLength, pierces, travel in self.cuts:
+            parts.append(dict(summary(cutLength, pierces, travel), color=color))
+            sums = colors.setdefault(color, [0.0, 0, 0.0])
+            for values in (sums, total):
+                values[0] += cutLength
+                values[1] += pierces
+                values[2] += travel
+        return {'parts': parts, 'colors': dict((color, summary(*sums)) for color, sums in colors.items()),
+                'total': summary(*total),
+                'rates': {'cutSpeed': self.cutSpeed, 'travelSpeed': self.travelSpeed, 'pierceTime': self.pierceTime}}
+
+    def toSVG(self, margin=10.0):
+        """the generated elements as standalone svg document, one user unit is one mm"""
+        width, height = (self.extent + margin).tolist()
+        root = etree.Element(inkex.addNS('svg', 'svg'), nsmap={None: inkex.NSS['svg']},
+                             attrib={'width': '%fmm' % width, 'height': '%fmm' % height,
+                                     'viewBox': '0 0 %f %f' % (width, height)})
+        self.writeTo(root)
+        return etree.tostring(root, xml_declaration=True, encoding='UTF-8')
+
+    def writeTo(self, parent):
+        """adds the generated elements to parent (e.g. the current layer)"""
+        for tag, attributes, text in self.elements:
+            node = etree.SubElement(parent, inkex.addNS(tag, 'svg'), attributes)
+            if text is not None:
+                node.text = text
+
     def drawMobileLoader(self):
         start = Point(10, 10)
         backRestStart = start.add(
@@ -564,18 +1728,28 @@ class BoxMaker(inkex.Effect):
         self.insertPath(usbLoch, 'orange')
 
     def drawBox(self):
-        outerRadius = self.thickness * self.hingeCircleFactor
-        dx = math.sqrt(outerRadius ** 2 - (self.thickness / 2) ** 2)
         shelfHeight = (self.boxWidth - 2 * self.thickness - (self.shelfcount - 1) * self.thickness) / self.shelfcount
 
         start = Point(10, 10)
         infoStart = start.add(-2, -2);
+        self.infoIndex = len(self.elements)
         infoText = self.boxType.description + " (generated on %s)  --- Width: %.2fmm, Depth: %.2fmm, Height: %.2fmm (Thickness: %.2fmm, frame length: %.2fmm)[shelfheight: %.2fmm]" % \
                    (self.printDate(), self.boxWidth, self.boxDepth, self.boxHeight, self.thickness, self.frameLength,
                     shelfHeight)
         # inkex.debug('boxFrame %s'%infoText)
         self.insertText(infoText, infoStart, 'orange')
 
+        self.drawBoxParts(start)
+
+    def drawBoxParts(self, start):
+        """
+        the parts of the box. Only the numbers of these parts depend on the dimensions, their structure
+        depends on the box type, so they can be recorded as templates (see boxmakerNTemplates.py).
+        Parts depending on the dimensions in their structure are drawn by separate methods.
+        """
+        outerRadius = self.thickness * self.hingeCircleFactor
+        dx = (outerRadius ** 2 - (self.thickness / 2) ** 2) ** 0.5
+
         bottomAndFrontBack = Path();
 
         # Move to start and draw a line from there
@@ -639,7 +1813,7 @@ class BoxMaker(inkex.Effect):
         bottomAndFrontBack.append(line(Point(-self.thickness, 0)))
 
         self.markPoints(bottomAndFrontBack.finalPosition(), 'green')
-        bottomAndFrontBack = bottomAndFrontBack.simplify()
+        bottomAndFrontBack = self.simplified(bottomAndFrontBack)
         self.markPoints(bottomAndFrontBack.finalPosition(), 'red')
         self.insertPath(bottomAndFrontBack)
 
@@ -656,36 +1830,7 @@ class BoxMaker(inkex.Effect):
 
         # Shelf frames
         if (self.boxType == shelvedBox):
-            # Shelf frames  front and back
-
-            nrInOutFrames = int(
-                math.floor((self.boxHeight - (self.frameEdgesMin * 2) - self.frameLength) / self.frameLength))
-            nrFrames = int(math.floor(nrInOutFrames / 2))
-            remainder = (self.boxHeight - nrFrames * self.frameLength * 2) / 2
-
-            for side in range(2):  # 0 is front,  1 is back
-                for i in range(self.shelfcount - 1):
-                    shelfFramesStart = start.add((i + 1) * (shelfHeight + self.thickness),
-                                                 (side * (self.boxDepth + self.boxHeight - 2 * self.thickness)))
-                    # self.markPoints(shelfFramesStart, 'blue')
-                    frameStart = shelfFramesStart.add(0, remainder + self.frameLength / 2)
-                    for i in range(nrFrames):
-                        self.insertRect(frameStart, self.thickness, self.frameLength, 'blue')
-                        frameStart = frameStart.add(0, self.frameLength * 2)
-
-            nrInOutFrames = int(
-                math.floor((self.boxDepth - (self.frameEdgesMin * 2) - self.frameLength) / self.frameLength))
-            nrFrames = int(math.floor(nrInOutFrames / 2))
-            remainder = (self.boxDepth - nrFrames * self.frameLength * 2) / 2
-            for i in range(self.shelfcount - 1):
-                shelfFramesStart = start.add((i + 1) * (shelfHeight + self.thickness),
-                                             (self.boxHeight - self.thickness))
-                # self.markPoints(shelfFramesStart, 'blue')
-                # inkex.debug('width %.2f remainder %.2f : fl %.2f'%(self.boxDepth, remainder, self.frameLength/2 ))
-                frameStart = shelfFramesStart.add(0, remainder + self.frameLength / 2)
-                for i in range(nrFrames):
-                    self.insertRect(frameStart, self.thickness, self.frameLength, 'blue')
-                    frameStart = frameStart.add(0, self.frameLength * 2)
+            self.drawShelfFrames(start)
 
         # Left and right part
         # left part
@@ -716,7 +1861,7 @@ class BoxMaker(inkex.Effect):
         leftPart.append(line(Point(0, self.thickness)))
         leftPart.extend(self.boxFrames(self.boxDepth, Direction.down))
 
-        self.insertPath(leftPart.simplify())
+        self.insertPath(self.simplified(leftPart))
 
         # left part
 
@@ -744,10 +1889,14 @@ class BoxMaker(inkex.Effect):
         rightPart.append(line(Point(0, self.thickness)))
         rightPart.extend(self.boxFrames(self.boxDepth, Direction.down))
 
-        self.insertPath(rightPart.simplify())
+        self.insertPath(self.simplified(rightPart))
 
         if (self.boxType == shelvedBox):
             self.draw_linehelves(start)
+        if self.boxType == livingHingeBox:
+            self.drawLivingHingeLid(start)
+        if self.boxType == gridBox:
+            self.drawGridDividers(start)
         # TOP Part (only for hinged boxes)
         if self.boxType.has_hinges():
 
@@ -764,66 +1913,146 @@ class BoxMaker(inkex.Effect):
             topPart.append(line(Point(-self.thickness, 0)))
             topPart.append(line(Point(0, -self.thickness)))
 
-            self.insertPath(topPart.simplify())
+            self.insertPath(self.simplified(topPart))
 
             # make boxes for the mobile stand
             if self.boxType == mobileLoader:
-                numberOfSupports = int(math.floor(self.boxWidth - self.thickness) / self.distanceBetweenSupports)
-                remainder = (self.boxWidth - self.thickness) - self.distanceBetweenSupports * numberOfSupports
-
-                dx = math.tan(math.pi / 2 - self.inclinationRad) * self.thickness
-                # frameWidth = self.thickness/math.sin(self.inclinationRad)
-                dxPlusd = dx / math.sin(self.inclinationRad) + self.thickness
-                nrInOutFrames = int(
-                    math.floor((self.backRestWidth - (self.frameEdgesMin * 2) - self.frameLength) / self.frameLength))
-                nrFrames = int(math.floor(nrInOutFrames / 2))
-                remainderFrames = (self.backRestWidth - ((nrFrames * 2) * self.frameLength)) / 2.0
-
-                lochLength = self.shelfLength - self.usbDepth;
-                smallerradius = self.usbDepth * 0.3
-                for supp in range(0, numberOfSupports):
-                    boxStart = topStart.add(self.thickness + remainder / 2.0 + self.distanceBetweenSupports * supp,
-                                            (self.boxDepth - self.backRestWidth) / 2.0)
-
-                    testBox = self.insertRect(boxStart, self.distanceBetweenSupports, self.backRestWidth, 'red')
-
-                    # =============================================================================
-                    standBoxStart = boxStart.add(self.thickness + lochLength, remainderFrames + 0.5 * self.frameLength)
-                    for i in range(nrFrames):
-                        self.insertRect(standBoxStart, dxPlusd, self.frameLength, 'blue')
-                        standBoxStart = standBoxStart.add(0, self.frameLength * 2)
-                    #
-                    supportBoxStart = boxStart.add(self.thickness + lochLength + dxPlusd + self.supportDistance,
-                                                   remainderFrames + 0.5 * self.frameLength)
-                    for i in range(nrFrames):
-                        self.insertRect(supportBoxStart, self.thickness, self.frameLength, 'blue')
-                        supportBoxStart = supportBoxStart.add(0, self.frameLength * 2)
-
-                        # usbLochStart
-                    lochBoxStart = boxStart.add(0.5 * self.thickness + lochLength,
-                                                self.backRestWidth / 2 - self.usbWidth / 2)
-                    self.markPoints(lochBoxStart, 'blue')
-                    usbLoch = Path()
-                    usbLoch.append(Move(lochBoxStart))
-                    usbLoch.lineBy(Point(0, self.usbWidth))
-                    usbLoch.lineBy(Point(-self.usbDepth, 0))
-                    extra = (self.usbWidth - self.usbDepth) / 2
-                    usbLoch.lineBy(Point(0, -extra))
-                    usbLoch = usbLoch.lineByWithCorner(smallerradius, Point(-lochLength + self.usbDepth, 0))
-                    usbLoch = usbLoch.lineByWithCorner(smallerradius, Point(0, -self.usbDepth))
-                    usbLoch = usbLoch.lineByWithCorner(smallerradius, Point(lochLength - self.usbDepth, 0))
-                    usbLoch = usbLoch.lineByWithCorner(smallerradius, Point(0, -extra))
-                    usbLoch.lineBy(Point(self.usbDepth, 0))
-
-                    self.insertPath(usbLoch, 'orange')
+                self.drawMobileSupports(topStart)
+
+    def drawShelfFrames(self, start):
+        """the slots of the shelves in front, back and bottom"""
+        shelfHeight = (self.boxWidth - 2 * self.thickness - (self.shelfcount - 1) * self.thickness) / self.shelfcount
+        # Shelf frames  front and back
+        nrInOutFrames = int(
+            math.floor((self.boxHeight - (self.frameEdgesMin * 2) - self.frameLength) / self.frameLength))
+        nrFrames = int(math.floor(nrInOutFrames / 2))
+        remainder = (self.boxHeight - nrFrames * self.frameLength * 2) / 2
+
+        for side in range(2):  # 0 is front,  1 is back
+            for i in range(self.shelfcount - 1):
+                shelfFramesStart = start.add((i + 1) * (shelfHeight + self.thickness),
+                                             (side * (self.boxDepth + self.boxHeight - 2 * self.thickness)))
+                # self.markPoints(shelfFramesStart, 'blue')
+                frameStart = shelfFramesStart.add(0, remainder + self.frameLength / 2)
+                for i in range(nrFrames):
+                    self.insertRect(frameStart, self.thickness, self.frameLength, 'blue')
+                    frameStart = frameStart.add(0, self.frameLength * 2)
+
+        nrInOutFrames = int(
+            math.floor((self.boxDepth - (self.frameEdgesMin * 2) - self.frameLength) / self.frameLength))
+        nrFrames = int(math.floor(nrInOutFrames / 2))
+        remainder = (self.boxDepth - nrFrames * self.frameLength * 2) / 2
+        for i in range(self.shelfcount - 1):
+            shelfFramesStart = start.add((i + 1) * (shelfHeight + self.thickness),
+                                         (self.boxHeight - self.thickness))
+            # self.markPoints(shelfFramesStart, 'blue')
+            # inkex.debug('width %.2f remainder %.2f : fl %.2f'%(self.boxDepth, remainder, self.frameLength/2 ))
+            frameStart = shelfFramesStart.add(0, remainder + self.frameLength / 2)
+            for i in range(nrFrames):
+                self.insertRect(frameStart, self.thickness, self.frameLength, 'blue')
+                frameStart = frameStart.add(0, self.frameLength * 2)
+
+    def drawMobileSupports(self, topStart):
+        """the supports of the mobile stand, placed on the top"""
+        numberOfSupports = int(math.floor(self.boxWidth - self.thickness) / self.distanceBetweenSupports)
+        remainder = (self.boxWidth - self.thickness) - self.distanceBetweenSupports * numberOfSupports
+
+        dx = math.tan(math.pi / 2 - self.inclinationRad) * self.thickness
+        # frameWidth = self.thickness/math.sin(self.inclinationRad)
+        dxPlusd = dx / math.sin(self.inclinationRad) + self.thickness
+        nrInOutFrames = int(
+            math.floor((self.backRestWidth - (self.frameEdgesMin * 2) - self.frameLength) / self.frameLength))
+        nrFrames = int(math.floor(nrInOutFrames / 2))
+        remainderFrames = (self.backRestWidth - ((nrFrames * 2) * self.frameLength)) / 2.0
+
+        lochLength = self.shelfLength - self.usbDepth;
+        smallerradius = self.usbDepth * 0.3
+        for supp in range(0, numberOfSupports):
+            boxStart = topStart.add(self.thickness + remainder / 2.0 + self.distanceBetweenSupports * supp,
+                                    (self.boxDepth - self.backRestWidth) / 2.0)
+
+            testBox = self.insertRect(boxStart, self.distanceBetweenSupports, self.backRestWidth, 'red')
+
+            # =============================================================================
+            standBoxStart = boxStart.add(self.thickness + lochLength, remainderFrames + 0.5 * self.frameLength)
+            for i in range(nrFrames):
+                self.insertRect(standBoxStart, dxPlusd, self.frameLength, 'blue')
+                standBoxStart = standBoxStart.add(0, self.frameLength * 2)
+            #
+            supportBoxStart = boxStart.add(self.thickness + lochLength + dxPlusd + self.supportDistance,
+                                           remainderFrames + 0.5 * self.frameLength)
+            for i in range(nrFrames):
+                self.insertRect(supportBoxStart, self.thickness, self.frameLength, 'blue')
+                supportBoxStart = supportBoxStart.add(0, self.frameLength * 2)
+
+                # usbLochStart
+            lochBoxStart = boxStart.add(0.5 * self.thickness + lochLength,
+                                        self.backRestWidth / 2 - self.usbWidth / 2)
+            self.markPoints(lochBoxStart, 'blue')
+            usbLoch = Path()
+            usbLoch.append(Move(lochBoxStart))
+            usbLoch.lineBy(Point(0, self.usbWidth))
+            usbLoch.lineBy(Point(-self.usbDepth, 0))
+            extra = (self.usbWidth - self.usbDepth) / 2
+            usbLoch.lineBy(Point(0, -extra))
+            usbLoch = usbLoch.lineByWithCorner(smallerradius, Point(-lochLength + self.usbDepth, 0))
+            usbLoch = usbLoch.lineByWithCorner(smallerradius, Point(0, -self.usbDepth))
+            usbLoch = usbLoch.lineByWithCorner(smallerradius, Point(lochLength - self.usbDepth, 0))
+            usbLoch = usbLoch.lineByWithCorner(smallerradius, Point(0, -extra))
+            usbLoch.lineBy(Point(self.usbDepth, 0))
+
+            self.insertPath(usbLoch, 'orange')
 
     #
     # =============================================================================
+    def simplified(self, path):
+        """the simplified path (the template recorder keeps simplification as a step)"""
+        return path.simplify()
+
+    def drawLivingHingeLid(self, start):
+        """the lid in one piece: top, living hinge and a flap to glue on the back"""
+        lidStart = start.add(self.boxWidth + self.boxHeight + 1 * self.hingeCircleFactor * self.thickness, 0)
+        self.insertRect(lidStart, self.boxWidth, self.boxDepth + self.hingeLength + self.boxHeight)
+        slits = livingHingeSlits(lidStart.add(0, self.boxDepth), self.boxWidth, self.hingeLength,
+                                 self.slitLength, self.slitGap, self.slitPitch)
+        if len(slits.ops):
+            self.insertPath(slits, 'red')
+
+    def drawGridDividers(self, start):
+        """
+        interlocking dividers for a grid of gridColumns x gridRows compartments.
+        There are only two kinds of dividers, the outline of each is generated once and repeated.
+        """
+        innerWidth = self.boxWidth - 2 * self.thickness
+        innerDepth = self.boxDepth - 2 * self.thickness
+        height = self.boxHeight - self.thickness
+        columnWidth = (innerWidth - (self.gridColumns - 1) * self.thickness) / self.gridColumns
+        rowDepth = (innerDepth - (self.gridRows - 1) * self.thickness) / self.gridRows
+        columnSlots = columnWidth + np.arange(self.gridColumns - 1) * (columnWidth + self.thickness)
+        rowSlots = rowDepth + np.arange(self.gridRows - 1) * (rowDepth + self.thickness)
+
+        # dividers along the width are slotted from the bottom, the ones along the depth from the top
+        dividers = [(dividerOutline(innerWidth, height, columnSlots, self.thickness, False), self.gridRows - 1),
+                    (dividerOutline(innerDepth, height, rowSlots, self.thickness, True), self.gridColumns - 1)]
+        dividerStart = start.add(self.boxWidth + self.boxHeight + 1 * self.hingeCircleFactor * self.thickness, 0)
+        row = 0
+        for outline, count in dividers:
+            if count <= 0:
+                continue
+            offsets = np.zeros((count, 2))
+            offsets[:, 0] = dividerStart.x
+            offsets[:, 1] = dividerStart.y + (row + np.arange(count)) * (height + 2)
+            for divider in outline.repeat(offsets).split():
+                self.insertPath(divider)
+            row += count
+
     def draw_linehelves(self, start):
-        for ii in range(self.shelfcount - 1):
-            shelfStart = start.add(self.boxWidth + self.boxHeight + self.thickness,
-                                   self.thickness + ii * (self.boxDepth + self.thickness))
-            self.draw_linehelf(shelfStart)
+        shelfStart = start.add(self.boxWidth + self.boxHeight + self.thickness, self.thickness)
+        shelf = PathArray.fromPaths([self.draw_linehelf(shelfStart)])
+        offsets = np.zeros((max(self.shelfcount - 1, 0), 2))
+        offsets[:, 1] = np.arange(len(offsets)) * (self.boxDepth + self.thickness)
+        for part in shelf.repeat(offsets).split():
+            self.insertPath(part)
 
     def draw_linehelf(self, shelfStart):
 
@@ -839,7 +2068,7 @@ class BoxMaker(inkex.Effect):
         leftPart.append(line(Point(0, self.thickness)))
         leftPart.extend(self.boxFrames(self.boxDepth, Direction.down))
 
-        self.insertPath(leftPart.simplify())
+        return leftPart.simplify()
 
     def insertRect(self, start_pos, dx, dy, color='black'):
         box = Path()
@@ -851,34 +2080,80 @@ class BoxMaker(inkex.Effect):
         self.insertPath(box, color)
 
     def insertText(self, text, position, color='black'):
-        style = {'stroke': color, 'stroke-width': self.svg.unittouu("0.1 mm"), 'font-size': '3px'}
+        style = {'stroke': color, 'stroke-width': self.lineWidth, 'font-size': '3px'}
         drw = {'style': str(inkex.Style(style)), 'x': '%f' % position.x, 'y': '%f' % position.y}
-        text_node = etree.SubElement(self.parent, inkex.addNS('text', 'svg'), drw)
-        text_node.text = text
+        self.elements.append(('text', drw, text))
 
     def insertPath(self, path, color='black'):
-        style = {'stroke': color, 'fill': 'none', 'stroke-width': self.svg.unittouu("0.1 mm")}
-        actions = path.translateToSVGd()
-        #    inkex.debug(' actions %s'%actions)
-        drw = {'style': str(inkex.Style(style)), 'd': actions}
-        edge = etree.SubElement(self.parent, inkex.addNS('path', 'svg'), drw)
+        self.parts.append(Part(path, color))
+        self.elements.append(None)
 
     def insertCircle(self, r, center, color='black'):
-        style = {'stroke': color, 'fill': 'none', 'stroke-width': self.svg.unittouu("0.1 mm")}
-        drw = {'style': str(inkex.Style(style)), 'cx': '%f' % center.x, 'cy': '%f' % center.y, 'r': '%f' % r}
-        edge = etree.SubElement(self.parent, inkex.addNS('circle', 'svg'), drw)
-
-    def toSVGString(self):
-        return "a %f %f 0 1 1 %f %f" % (self.r, self.r, self.endPoint.x, self.endPoint.y)
-
-    def newPos(self, start_pos):
-        return start_pos.add(self.endPoint.x, self.endPoint.y)
+        self.parts.append(Part(None, color, r, center))
+        self.elements.append(None)
 
-    def printDate(self, date=datetime.now()):
+    def flushParts(self):
+        """
+        writes the collected parts to the document, with relief at the concave corners,
+        compensated for the kerf, flattened in polylines mode and snapped to the grid.
+        The parts are moved to their local frame and placed by their transforms, their elements
+        take the places kept by insertPath and insertCircle (in the order of the drawing).
+        """
+        written = len(self.elements)
+        # the paths are converted to one PathArray here, the steps pass it on (as the views of their result)
+        paths = iter(PathArray.fromPaths([part.path for part in self.parts if part.path is not None]).split())
+        parts = [part if part.path is None else Part(next(paths), part.color) for part in self.parts]
+        if self.cornerRelief != 'none':
+            parts = reliefCorners(parts, self.toolRadius, self.cornerRelief)
+        if self.kerf > 0.0:
+            parts = kerfCompensate(parts, self.kerf)
+        if self.outputMode == 'polylines':
+            parts = flattenParts(parts, self.chordTolerance)
+        local = localParts(parts)
+        self.placed.extend(local)
+        parts = placeParts(local)
+        for part in (local if self.placement == 'transform' else parts):
+            if part.path is None:
+                self.writeCircle(part.r, part.center, part.color, part.transform)
+            elif self.fixedPoint:
+                self.writePath(part.path.toFixed(), part.color, part.transform)
+            else:
+                self.writePath(part.path, part.color, part.transform)
+        slots = [i for i, element in enumerate(self.elements[:written]) if element is None]
+        for i, element in zip(slots, self.elements[written:]):
+            self.elements[i] = element
+        del self.elements[written:]
+        self.extent = np.maximum(self.extent, partsExtent(parts))
+        cutLength, pierces, travel, self.headPosition = cutMetrics(parts, self.headPosition)
+        self.cuts.extend(zip([part.color for part in parts], cutLength.tolist(), pierces.tolist(), travel.tolist()))
+        self.parts = []
+
+    def cutStyle(self, color):
+        """the style attribute of the cuts of a color, made once per color (inkex.Style parses it)"""
+        key = (color, self.lineWidth)
+        if key not in self.styles:
+            self.styles[key] = str(inkex.Style({'stroke': color, 'fill': 'none', 'stroke-width': self.lineWidth}))
+        return self.styles[key]
+
+    def writePath(self, path, color='black', transform=None):
+        actions = path.translateToSVGd()
+        #    inkex.debug(' actions %s'%actions)
+        drw = {'style': self.cutStyle(color), 'd': actions}
+        if transform is not None:
+            drw['transform'] = svgTransform(transform)
+        self.elements.append(('path', drw, None))
+
+    def writeCircle(self, r, center, color='black', transform=None):
+        drw = {'style': self.cutStyle(color), 'cx': '%f' % center.x, 'cy': '%f' % center.y, 'r': '%f' % r}
+        if transform is not None:
+            drw['transform'] = svgTransform(transform)
+        self.elements.append(('circle', drw, None))
+
+    def printDate(self, date=None):
+        if date is None:
+            date = self.date
         return date.strftime('%d.%m.%y %H:%M')
 
-    markerCount = 0
-
     def markPoints(self, center, color='red'):
         """
     Just a helper method to mark certain points
@@ -886,16 +2161,15 @@ class BoxMaker(inkex.Effect):
 
         if self.debug:
             self.markerCount += 1
-            style = {'stroke': color, 'fill': 'none', 'stroke-width': self.svg.unittouu("2 mm")}
+            style = {'stroke': color, 'fill': 'none', 'stroke-width': self.markerWidth}
             drw = {'style': str(inkex.Style(style)), 'cx': '%f' % center.x, 'cy': '%f' % center.y, 'r': '4'}
-            etree.SubElement(self.parent, inkex.addNS('circle', 'svg'), drw)
+            self.elements.append(('circle', drw, None))
 
-            style = {'stroke': 'black', 'stroke-width': self.svg.unittouu("0.1 mm"), 'font-size': '3px'}
+            style = {'stroke': 'black', 'stroke-width': self.lineWidth, 'font-size': '3px'}
             drw = {'style': str(inkex.Style(style)), 'x': '%f' % (center.x + 5.0), 'y': '%f' % (center.y + 5),
                    'r': '4'}
             #      inkex.debug("Text: %s" % drw)
-            text_node = etree.SubElement(self.parent, inkex.addNS('text', 'svg'), drw)
-            text_node.text = '%s: (%.2f,%.2f)' % (self.markerCount, center.x, center.y)
+            self.elements.append(('text', drw, '%s: (%.2f,%.2f)' % (self.markerCount, center.x, center.y)))
 
     def boxFrames(self, length, direction, inverse=False, depth=None):
         """
@@ -939,3 +2213,156 @@ class BoxMaker(inkex.Effect):
         path.append(line(startEnd))
         if (inverse): path.append(line(walkOut))
         return path
+
+
+class BoxMaker(BoxGenerator, inkex.Effect):
+    def __init__(self):
+        BoxGenerator.__init__(self)
+
+        # Call the base class constructor.
+        inkex.Effect.__init__(self)
+        # Define options - Must match to the <param> elements in the .inx file
+        # just dummies for the tabs
+        self.arg_parser.add_argument('--tab', action='store', dest='tab', type=str, default='mm',
+                                     help='just a dummy')
+        self.arg_parser.add_argument('--HingeAndFrame', action='store', dest='tab', type=str, default='mm',
+                                     help='just a dummy')
+        self.arg_parser.add_argument('--Development', action='store', dest='tab', type=str, default='mm',
+                                     help='just a dummy')
+        self.arg_parser.add_argument('--Grid', action='store', dest='tab', type=str, default='mm',
+                                     help='just a dummy')
+        self.arg_parser.add_argument('--LivingHinge', action='store', dest='tab', type=str, default='mm',
+                                     help='just a dummy')
+        self.arg_parser.add_argument('--Output', action='store', dest='tab', type=str, default='mm',
+                                     help='just a dummy')
+
+        self.arg_parser.add_argument('--boxType', action='store', dest='boxType', type=str, default='openBox',
+                                     help='Type of Box')
+        self.arg_parser.add_argument('--unit', action='store', dest='unit', type=str, default='mm',
+                                     help='units of measurement')
+
+        self.arg_parser.add_argument('--box_width', action='store', type=float, dest='boxWidth', default=200.0,
+                                     help='width of the box.')
+        self.arg_parser.add_argument('--box_depth', action='store', type=float, dest='boxDepth', default=120.0,
+                                     help='depth of the box.')
+        self.arg_parser.add_argument('--box_height', action='store', type=float, dest='boxHeight', default=70.0,
+                                     help='height of the box.')
+        self.arg_parser.add_argument('--thickness', action='store', type=float, dest='thickness', default=0,
+                                     help='thickness of the material.')
+        self.arg_parser.add_argument('--shelfCount', action='store', type=int, dest='shelfCount', default=1,
+                                     help='number of shelves.')
+        self.arg_parser.add_argument('--gridColumns', action='store', type=int, dest='gridColumns', default=3,
+                                     help='number of compartments across the width.')
+        self.arg_parser.add_argument('--gridRows', action='store', type=int, dest='gridRows', default=2,
+                                     help='number of compartments across the depth.')
+
+        self.arg_parser.add_argument('--frameEdgesMin', action='store', type=float, dest='frameEdgesMin', default=0,
+                                     help='Minimum distance of frame to edge.')
+        self.arg_parser.add_argument('--frameLength', action='store', type=float, dest='frameLength', default=0,
+                                     help='Length of a frame.')
+        self.arg_parser.add_argument('--hingeCircleFactor', action='store', type=float, dest='hingeCircleFactor',
+                                     default=1.5, help='Size of hinge circle.')
+        self.arg_parser.add_argument('--slitLength', action='store', type=float, dest='slitLength', default=20.0,
+                                     help='Length of a slit of the living hinge.')
+        self.arg_parser.add_argument('--slitGap', action='store', type=float, dest='slitGap', default=3.0,
+                                     help='Material left between two slits of a row.')
+        self.arg_parser.add_argument('--slitPitch', action='store', type=float, dest='slitPitch', default=2.0,
+                                     help='Distance of the rows of slits.')
+        self.arg_parser.add_argument('--hingeLength', action='store', type=float, dest='hingeLength', default=30.0,
+                                     help='Length of the living hinge.')
+        self.arg_parser.add_argument('--kerf', action='store', type=float, dest='kerf', default=0.0,
+                                     help='Width of the cut.')
+        self.arg_parser.add_argument('--fixedPoint', action='store', type=inkex.Boolean, dest='fixedPoint',
+                                     default=False, help='Snap the geometry to a grid of 1/1000 unit.')
+        self.arg_parser.add_argument('--outputMode', action='store', type=str, dest='outputMode', default='arcs',
+                                     help='arcs or polylines (arcs and circles flattened to lines).')
+        self.arg_parser.add_argument('--chordTolerance', action='store', type=float, dest='chordTolerance',
+                                     default=0.01, help='Maximum deviation of flattened arcs.')
+
+        self.arg_parser.add_argument('--cornerRelief', action='store', type=str, dest='cornerRelief', default='none',
+                                     help='Relief of the concave corners for routing: none, dogbone or tbone.')
+        self.arg_parser.add_argument('--toolRadius', action='store', type=float, dest='toolRadius', default=1.5,
+                                     help='Radius of the router bit of the corner relief.')
+        self.arg_parser.add_argument('--placement', action='store', type=str, dest='placement', default='coordinates',
+                                     help='coordinates (placed parts) or transform (local parts with transforms).')
+        self.arg_parser.add_argument('--cutSpeed', action='store', type=float, dest='cutSpeed', default=20.0,
+                                     help='Cutting feed rate (units per second) of the machine time estimate.')
+        self.arg_parser.add_argument('--travelSpeed', action='store', type=float, dest='travelSpeed', default=200.0,
+                                     help='Travel feed rate (units per second) of the machine time estimate.')
+        self.arg_parser.add_argument('--pierceTime', action='store', type=float, dest='pierceTime', default=0.5,
+                                     help='Seconds per pierce of the machine time estimate.')
+        self.arg_parser.add_argument('--metricsFile', action='store', type=str, dest='metricsFile', default='',
+                                     help='Write the cut metrics as JSON to this file (empty: no file).')
+
+        self.arg_parser.add_argument('--generateOnly', action='store', type=inkex.Boolean, dest='generateOnly',
+                                     default=False, help='Append the box as a new group without parsing the document.')
+
+        self.arg_parser.add_argument('--debug', action='store', type=bool, dest='debug', default='False',
+                                     help='debug Info')
+
+    def parameters(self):
+        """the parameters of the options, converted to user units"""
+        unit = self.options.unit
+        # starting cut length. Will be adjusted for get an integer number of cuts in the y-direction.
+        return BoxParameters(
+            boxType=self.options.boxType,
+            boxWidth=self.svg.unittouu(str(self.options.boxWidth) + unit),
+            boxDepth=self.svg.unittouu(str(self.options.boxDepth) + unit),
+            boxHeight=self.svg.unittouu(str(self.options.boxHeight) + unit),
+            thickness=self.svg.unittouu(str(self.options.thickness) + unit),
+            shelfCount=self.options.shelfCount,
+            frameEdgesMin=self.svg.unittouu(str(self.options.frameEdgesMin) + unit),
+            frameLength=self.svg.unittouu(str(self.options.frameLength) + unit),
+            hingeCircleFactor=self.options.hingeCircleFactor,
+            slitLength=self.svg.unittouu(str(self.options.slitLength) + unit),
+            slitGap=self.svg.unittouu(str(self.options.slitGap) + unit),
+            slitPitch=self.svg.unittouu(str(self.options.slitPitch) + unit),
+            hingeLength=self.svg.unittouu(str(self.options.hingeLength) + unit),
+            gridColumns=self.options.gridColumns,
+            gridRows=self.options.gridRows,
+            kerf=self.svg.unittouu(str(self.options.kerf) + unit),
+            fixedPoint=self.options.fixedPoint,
+            outputMode=self.options.outputMode,
+            chordTolerance=self.svg.unittouu(str(self.options.chordTolerance) + unit),
+            debug=self.options.debug,
+            lineWidth=self.svg.unittouu("0.1 mm"),
+            markerWidth=self.svg.unittouu("2 mm"),
+            cornerRelief=self.options.cornerRelief,
+            placement=self.options.placement,
+            toolRadius=self.svg.unittouu(str(self.options.toolRadius) + unit),
+            cutSpeed=self.svg.unittouu(str(self.options.cutSpeed) + unit),
+            travelSpeed=self.svg.unittouu(str(self.options.travelSpeed) + unit),
+            pierceTime=self.options.pierceTime)
+
+    def load(self, stream):
+        """
+        in generateOnly mode the document is kept as it is read, only its root element is parsed
+        (for the units), otherwise the document is parsed by inkex
+        """
+        if not self.options.generateOnly:
+            return inkex.Effect.load(self, stream)
+        data = stream.read()
+        for event, root in etree.iterparse(io.BytesIO(data), events=('start',), huge_tree=True):
+            break
+        size = dict((name, root.get(name)) for name in ('width', 'height', 'viewBox') if root.get(name) is not None)
+        self.svg = inkex.load_svg(etree.tostring(etree.Element(inkex.addNS('svg', 'svg'), size))).getroot()
+        return data
+
+    def has_changed(self, ret):
+        return True if self.options.generateOnly else inkex.Effect.has_changed(self, ret)
+
+    def effect(self):
+        # every run generates with its own parameters and state
+        generator = BoxGenerator(self.parameters())
+        generator.generate()
+        if self.options.generateOnly:
+            # the new group is inserted before the end tag of the root, the document is not serialized again
+            group = etree.Element(inkex.addNS('g', 'svg'), {inkex.addNS('label', 'inkscape'): 'Box'},
+                                  nsmap={None: inkex.NSS['svg'], 'inkscape': inkex.NSS['inkscape']})
+            generator.writeTo(group)
+            end = self.document.rfind(b'</')
+            self.document = self.document[:end] + etree.tostring(group) + self.document[end:]
+        else:
+            generator.writeTo(self.svg.get_current_layer())
+        if self.options.metricsFile:
+            generator.writeMetrics(self.options.metricsFile)
@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+"""
+boxmakerNLoadTest.py
+Load test of the generation service (boxmakerNService.py).
+
+usage: python boxmakerNLoadTest.py [--host 127.0.0.1] [--port 8642] [--socket path] [--start]
+                                   [--requests 2000] [--concurrency 8] [--distinct 50]
+
+sends requests of distinct parameter sets (box widths) from concurrency threads, each keeping its
+connection open, and prints the latencies and throughput seen by the clients and the metrics of
+the service. With --start the service is run in this process.
+"""
+
+import argparse, threading, time
+from boxmakerNService import DEFAULT_PORT, GenerationService, ServiceClient, makeServer
+
+
+def percentile(latencies, fraction):
+    return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)] * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='load test of the box generation service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', dest='socketPath', default=None)
+    parser.add_argument('--start', action='store_true', help='run the service in this process')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--distinct', type=int, default=50, help='number of distinct parameter sets')
+    parser.add_argument('--boxType', default='withHinge')
+    options = parser.parse_args()
+
+    server = None
+    if options.start:
+        server = makeServer(GenerationService(), options.host, options.port, options.socketPath)
+        if not options.socketPath:
+            # the port of the server, if started on any free port (0)
+            options.port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(index):
+        client = ServiceClient(options.host, options.port, options.socketPath)
+        own = []
+        for i in range(index, options.requests, options.concurrency):
+            start = time.perf_counter()
+            client.generate(boxType=options.boxType, boxWidth=150.0 + i % options.distinct)
+            own.append(time.perf_counter() - start)
+        client.close()
+        with lock:
+            latencies.extend(own)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(options.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print('%d requests, %d threads, %d distinct: %.1f requests/s' %
+          (len(latencies), options.concurrency, options.distinct, len(latencies) / elapsed))
+    print('latency p50 %.2f ms, p95 %.2f ms, p99 %.2f ms, max %.2f ms' %
+          (percentile(latencies, 0.5), percentile(latencies, 0.95), percentile(latencies, 0.99),
+           percentile(latencies, 1.0)))
+    client = ServiceClient(options.host, options.port, options.socketPath)
+    metrics = client.metrics()
+    client.close()
+    print('service: ' + ', '.join('%s %s' % (name, round(value, 2)) for name, value in sorted(metrics.items())))
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
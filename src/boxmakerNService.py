@@ -0,0 +1,229 @@
+#! /usr/bin/env python
+"""
+boxmakerNService.py
+A long running local service generating box layouts, so a preview does not pay for
+starting python, importing inkex and parsing the options of the extension.
+
+usage: python boxmakerNService.py [--host 127.0.0.1] [--port 8642] [--socket path] [--cacheSize 256]
+
+POST /generate  the box parameters as JSON object (the fields of BoxParameters, lengths in mm),
+                returns the svg document. The result is cached by its parameters, identical
+                requests arriving while it is generated wait for the same generation.
+GET  /metrics   request counters, latencies and throughput as JSON
+"""
+
+import argparse, http.client, json, os, socket, socketserver, threading, time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from boxmakerNLib import BoxGenerator, parametersFromJson
+
+DEFAULT_PORT = 8642
+
+
+def generateSVG(params):
+    generator = BoxGenerator(params)
+    generator.generate()
+    return generator.toSVG()
+
+
+class GenerationService:
+    """
+    generates the svg documents of BoxParameters with a cache of the last cacheSize results.
+    Concurrent requests of the same parameters are coalesced into one generation.
+    """
+
+    def __init__(self, cacheSize=256, generate=generateSVG, window=10000):
+        self.cacheSize = cacheSize
+        self.generate = generate
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.inFlight = {}
+        self.started = time.time()
+        self.counters = {'requests': 0, 'cacheHits': 0, 'coalesced': 0, 'generated': 0, 'errors': 0}
+        # latencies (in s) of the last window requests
+        self.latencies = deque(maxlen=window)
+
+    def get(self, params):
+        start = time.perf_counter()
+        owner = False
+        with self.lock:
+            self.counters['requests'] += 1
+            future = self.inFlight.get(params)
+            if params in self.cache:
+                self.cache.move_to_end(params)
+                self.counters['cacheHits'] += 1
+                future = Future()
+                future.set_result(self.cache[params])
+            elif future is not None:
+                self.counters['coalesced'] += 1
+            else:
+                future = self.inFlight[params] = Future()
+                owner = True
+        if owner:
+            try:
+                result = self.generate(params)
+            except Exception as e:
+                with self.lock:
+                    del self.inFlight[params]
+                    self.counters['errors'] += 1
+                future.set_exception(e)
+            else:
+                with self.lock:
+                    self.cache[params] = result
+                    while len(self.cache) > self.cacheSize:
+                        self.cache.popitem(last=False)
+                    del self.inFlight[params]
+                    self.counters['generated'] += 1
+                future.set_result(result)
+        try:
+            return future.result()
+        finally:
+            with self.lock:
+                self.latencies.append(time.perf_counter() - start)
+
+    def metrics(self):
+        with self.lock:
+            metrics = dict(self.counters)
+            latencies = sorted(self.latencies)
+            metrics['cached'] = len(self.cache)
+            metrics['inFlight'] = len(self.inFlight)
+        uptime = time.time() - self.started
+        metrics['uptime'] = uptime
+        metrics['throughput'] = metrics['requests'] / uptime if uptime > 0 else 0.0
+        for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0)):
+            index = min(int(fraction * len(latencies)), len(latencies) - 1)
+            metrics['latency_' + name + '_ms'] = latencies[index] * 1000.0 if latencies else 0.0
+        return metrics
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, do not wait for the ack of the headers
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        if self.path != '/generate':
+            return self.reply(404, b'unknown path')
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length < 0:
+                raise ValueError('negative Content-Length')
+        except ValueError as e:
+            # the end of the body is unknown, the connection can not be reused
+            self.close_connection = True
+            return self.reply(400, str(e).encode('utf-8'))
+        try:
+            params = parametersFromJson(json.loads(self.rfile.read(length) or b'{}'))
+        except ValueError as e:
+            return self.reply(400, str(e).encode('utf-8'))
+        try:
+            svg = self.server.service.get(params)
+        except Exception as e:
+            return self.reply(500, ('generation failed: %r' % e).encode('utf-8'))
+        self.reply(200, svg, 'image/svg+xml')
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            return self.reply(404, b'unknown path')
+        self.reply(200, json.dumps(self.server.service.metrics()).encode('utf-8'), 'application/json')
+
+    def reply(self, status, body, contentType='text/plain; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # unix sockets have no client address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'local'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class UnixServiceHandler(ServiceHandler):
+    disable_nagle_algorithm = False
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def makeServer(service, host='127.0.0.1', port=DEFAULT_PORT, socketPath=None, verbose=False):
+    """an http server of the service on host:port or, if given, on the unix socket socketPath"""
+    if socketPath:
+        server = UnixHTTPServer(socketPath, UnixServiceHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ServiceHandler)
+        server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socketPath, timeout=60):
+        http.client.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.socketPath = socketPath
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socketPath)
+
+
+class ServiceClient:
+    """a client of the service, keeps its connection open (one client per thread)"""
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, socketPath=None, timeout=60):
+        if socketPath:
+            self.connection = UnixHTTPConnection(socketPath, timeout)
+        else:
+            self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, path, body=None):
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        self.connection.request(method, path, body, headers)
+        response = self.connection.getresponse()
+        data = response.read()
+        if response.status != 200:
+            raise RuntimeError('%d %s' % (response.status, data.decode('utf-8', 'replace')))
+        return data
+
+    def generate(self, **params):
+        """the svg document of the box"""
+        return self.request('POST', '/generate', json.dumps(params).encode('utf-8'))
+
+    def metrics(self):
+        return json.loads(self.request('GET', '/metrics'))
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='local box generation service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', dest='socketPath', default=None, help='listen on this unix socket instead')
+    parser.add_argument('--cacheSize', type=int, default=256, help='number of cached documents')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    options = parser.parse_args()
+
+    server = makeServer(GenerationService(options.cacheSize), options.host, options.port, options.socketPath,
+                        options.verbose)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if options.socketPath:
+            os.remove(options.socketPath)
+
+
+if __name__ == '__main__':
+    main()
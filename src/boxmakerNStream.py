@@ -0,0 +1,97 @@
+#! /usr/bin/env python
+"""
+boxmakerNStream.py
+Writes the layouts of many boxes to one svg document without building the document in memory:
+the elements of every box are streamed to the file as soon as the box is generated, so the memory
+stays the same whatever the number of boxes.
+
+usage: python boxmakerNStream.py boxes.jsonl out.svg [--width 1000 --height 600]
+  boxes.jsonl has a JSON object of box parameters per line (the fields of BoxParameters, lengths in mm)
+
+    with SVGStreamWriter('out.svg') as writer:
+        for params in paramSets:        # any iterable, e.g. a generator
+            writer.writeBox(params)
+
+The boxes are laid out one below the other, each in its own group. As the size of the document is
+not known before the last box, the svg gets width, height and viewBox only if they are given.
+"""
+
+import argparse, json, sys
+import inkex
+from lxml import etree
+from boxmakerNLib import BoxGenerator, parametersFromJson
+
+
+class SVGStreamWriter:
+    """an svg document written incrementally with lxml.etree.xmlfile, a group per box"""
+
+    def __init__(self, fileName, width=None, height=None):
+        self.fileName = fileName
+        self.attributes = {}
+        if width is not None and height is not None:
+            self.attributes = {'width': '%fmm' % width, 'height': '%fmm' % height,
+                               'viewBox': '0 0 %f %f' % (width, height)}
+        # top of the next box
+        self.y = 0.0
+        self.boxCount = 0
+
+    def __enter__(self):
+        self.xmlFile = etree.xmlfile(self.fileName, encoding='UTF-8')
+        self.writer = self.xmlFile.__enter__()
+        self.writer.write_declaration()
+        self.root = self.writer.element(inkex.addNS('svg', 'svg'), self.attributes, nsmap={None: inkex.NSS['svg']})
+        self.root.__enter__()
+        return self
+
+    def __exit__(self, *exception):
+        self.root.__exit__(*exception)
+        return self.xmlFile.__exit__(*exception)
+
+    def writeBox(self, params):
+        """generates a box and writes its elements below the previous boxes, returns the generator"""
+        generator = BoxGenerator(params)
+        generator.generate()
+        attributes = {'id': 'box%d' % self.boxCount, 'transform': 'translate(0,%f)' % self.y}
+        with self.writer.element(inkex.addNS('g', 'svg'), attributes):
+            for tag, attributes, text in generator.elements:
+                with self.writer.element(inkex.addNS(tag, 'svg'), attributes):
+                    if text is not None:
+                        self.writer.write(text)
+        self.writer.flush()
+        self.y += float(generator.extent[1])
+        self.boxCount += 1
+        return generator
+
+
+def writeBoxes(fileName, paramSets, width=None, height=None):
+    """streams the boxes of an iterable of BoxParameters to an svg document, returns the number of boxes"""
+    with SVGStreamWriter(fileName, width, height) as writer:
+        for params in paramSets:
+            writer.writeBox(params)
+    return writer.boxCount
+
+
+def readParameters(lines):
+    """BoxParameters of the JSON lines, one after the other (empty lines are skipped)"""
+    for line in lines:
+        if line.strip():
+            yield parametersFromJson(json.loads(line))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='streams the layouts of many boxes to one svg document')
+    parser.add_argument('boxes', help='JSON lines of box parameters, - for standard input')
+    parser.add_argument('out')
+    parser.add_argument('--width', type=float, default=None)
+    parser.add_argument('--height', type=float, default=None)
+    options = parser.parse_args()
+    if options.boxes == '-':
+        count = writeBoxes(options.out, readParameters(sys.stdin), options.width, options.height)
+    else:
+        with open(options.boxes) as lines:
+            count = writeBoxes(options.out, readParameters(lines), options.width, options.height)
+    print('%d boxes written to %s' % (count, options.out))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+#! /usr/bin/env python
+"""
+boxmakerNSweep.py
+Design space sweep: evaluates the box geometry for all combinations of parameter ranges without
+generating any svg and returns a table of material and cut metrics per combination.
+
+usage: python boxmakerNSweep.py [--boxType withHinge] [--out sweep.csv] [--<parameter> range ...]
+  a range is start:stop:count (evenly spaced, stop included) or a comma separated list,
+  e.g. --boxWidth 100:400:61 --thickness 3,4,6 --frameLength 8:12:5
+
+The metrics come from the parametric templates (boxmakerNTemplates.py), so they cover the
+parts of BoxGenerator.drawBoxParts: the parts depending on the dimensions in their structure
+(shelves, living hinge lid, dividers, mobile supports) are not included. A path is walked step
+by step for all combinations at once, a row of tabs is one step whatever its number of tabs, and
+parallel lines are merged like the simplification of the drawn paths, so cut lengths and sizes are
+those of the drawn parts. partsArea adds up the bounding boxes of the outlines of the parts: closed
+paths (a gap below MAX_GAP_RATIO of their size, as for the kerf) which do not lie within another
+one, so the open separator lines and the hinge circles do not count.
+"""
+
+import argparse, math, sys
+import numpy as np
+from boxmakerNLib import BoxParameters, Move, move, circleArc, arcAngles, EPSILON, MAX_GAP_RATIO
+from boxmakerNTemplates import CircleTemplate, compileTemplate, evaluate, frames
+
+# combinations evaluated at once, bounds the memory of the intermediate arrays
+BATCH_SIZE = 8192
+
+
+class Bounds:
+    """bounding boxes and cut lengths of count parameter sets, accumulated segment by segment"""
+
+    def __init__(self, count):
+        self.lo = np.full((count, 2), np.inf)
+        self.hi = np.full((count, 2), -np.inf)
+        self.length = np.zeros(count)
+
+    def include(self, points, where=True):
+        """extends the bounds by points (count x 2), only of the parameter sets selected by where"""
+        where = np.asarray(where)[..., None]
+        self.lo = np.where(where, np.minimum(self.lo, points), self.lo)
+        self.hi = np.where(where, np.maximum(self.hi, points), self.hi)
+
+
+class PathWalk:
+    """
+    walks a path template for count parameter sets at once, tracking position, bounds and cut length.
+    With merge, consecutive parallel lines are merged and empty ones dropped like PathArray.simplify,
+    so the bounds and lengths are those of the simplified path.
+    """
+
+    def __init__(self, count, merge):
+        self.bounds = Bounds(count)
+        self.merge = merge
+        self.pos = np.zeros((count, 2))
+        # the position of the last move
+        self.start = np.zeros((count, 2))
+        # the lines merged so far and the last of them
+        self.chain = np.zeros((count, 2))
+        self.last = np.zeros((count, 2))
+
+    def flush(self, where=True):
+        """ends the merged lines, their end is a vertex of the path"""
+        length = np.hypot(*self.chain.T)
+        self.bounds.length += np.where(where, length, 0.0)
+        self.bounds.include(self.pos, where & (length > 0.0))
+        column = np.asarray(where)[..., None]
+        self.chain = np.where(column, 0.0, self.chain)
+        self.last = np.where(column, 0.0, self.last)
+
+    def line(self, delta, where=True):
+        length = np.hypot(*delta.T)
+        kept = where & (length > EPSILON)
+        if self.merge:
+            cross = self.last[:, 0] * delta[:, 1] - self.last[:, 1] * delta[:, 0]
+            lastLength = np.hypot(*self.last.T)
+            join = (lastLength > 0.0) & (np.abs(cross) <= EPSILON * np.maximum(length, lastLength))
+            self.flush(kept & ~join)
+        else:
+            self.flush(kept)
+        column = kept[:, None]
+        self.chain = np.where(column, self.chain + delta, self.chain)
+        self.last = np.where(column, delta, self.last)
+        self.pos = np.where(column, self.pos + delta, self.pos)
+
+    def segment(self, delta, length, where):
+        """a part of the path which does not merge with its neighbours, of the given length"""
+        self.flush(where)
+        self.pos = np.where(where[:, None], self.pos + delta, self.pos)
+        self.bounds.length += np.where(where, length, 0.0)
+        self.bounds.include(self.pos, where)
+
+    def arc(self, delta, r, largeArc, sweepFlag):
+        self.flush()
+        end = self.pos + delta
+        count = len(r)
+        center, radius, angle, extent = arcAngles(self.pos, end, np.stack(
+            (r, np.full(count, float(largeArc)), np.full(count, float(sweepFlag))), axis=1))
+        # the extreme points of the circle lying on the arc
+        for quarter in range(4):
+            direction = quarter * math.pi / 2.0
+            passed = np.where(extent >= 0.0, np.mod(direction - angle, 2.0 * math.pi) <= extent,
+                              np.mod(angle - direction, 2.0 * math.pi) <= -extent)
+            extreme = center + radius[:, None] * np.array([math.cos(direction), math.sin(direction)])
+            self.bounds.include(extreme, passed)
+        self.bounds.length += radius * np.abs(extent)
+        self.pos = end
+        self.bounds.include(end)
+
+    def moveTo(self, pos):
+        self.flush()
+        self.pos = pos
+        self.start = pos
+        self.bounds.include(pos)
+
+    def frames(self, nrFrames, startEnd, half, first, second, inverse, walkIn, walkOut):
+        """
+        a row of tabs: startEnd, nrFrames times (half, first, half, half, second, half), startEnd.
+        Only the atoms at the ends of a row can merge with its neighbours, the middle is walked at once.
+        """
+        tabs = nrFrames > 0
+        if inverse:
+            self.line(walkIn)
+        self.line(startEnd)
+        self.line(half, tabs)
+        self.line(first, tabs)
+        middle = np.maximum(nrFrames - 1, 0)[:, None]
+        self.segment((4 * middle + 2) * half + middle * (first + second),
+                     (4 * middle[:, 0] + 2) * np.hypot(*half.T) + middle[:, 0] * (np.hypot(*first.T) +
+                                                                                 np.hypot(*second.T)), tabs)
+        self.line(second, tabs)
+        self.line(half, tabs)
+        self.line(startEnd)
+        if inverse:
+            self.line(walkOut)
+
+
+def pathMetrics(template, columns, count, cache):
+    """
+    bounds, number of tabs, the smallest number of tabs of a row and whether the path is closed
+    (ends within MAX_GAP_RATIO of its size of its last move) of a path template
+    """
+
+    def values(point):
+        return np.stack([np.broadcast_to(evaluate(value, columns, cache), count).astype(float)
+                         for value in (point.x, point.y)], axis=1)
+
+    walk = PathWalk(count, template.simplify)
+    tabs = np.zeros(count, dtype=np.intp)
+    fewestTabs = np.full(count, np.iinfo(np.intp).max)
+    for step in template.steps:
+        if isinstance(step, frames):
+            nrFrames = np.broadcast_to(evaluate(step.nrFrames, columns, cache), count)
+            # a number of tabs which is not a number (e.g. for frameLength 0) makes no geometry
+            finite = np.isfinite(nrFrames)
+            walk.bounds.length[~finite] = np.nan
+            nrFrames = np.where(finite, np.maximum(nrFrames, 0), 0).astype(np.intp)
+            walk.frames(nrFrames, values(step.startEnd), values(step.half), values(step.first), values(step.second),
+                        step.inverse, values(step.walkIn), values(step.walkOut))
+            tabs += nrFrames
+            fewestTabs = np.minimum(fewestTabs, nrFrames)
+        elif isinstance(step, circleArc):
+            walk.arc(values(step.endPoint), np.broadcast_to(evaluate(step.r, columns, cache), count).astype(float),
+                     step.largeArc, step.sweepFlag)
+        elif isinstance(step, Move):
+            walk.moveTo(values(step.p))
+        elif isinstance(step, move):
+            walk.moveTo(walk.pos + values(step.p))
+        else:
+            walk.line(values(step.p))
+    walk.flush()
+    size = (walk.bounds.hi - walk.bounds.lo).max(axis=1)
+    closed = np.hypot(*(walk.pos - walk.start).T) <= MAX_GAP_RATIO * size
+    return walk.bounds, tabs, fewestTabs, closed
+
+
+def sweepColumns(ranges):
+    """parameter columns of all combinations of the ranges (a dict of sequences)"""
+    names = list(ranges)
+    grids = np.meshgrid(*[np.asarray(ranges[name]) for name in names], indexing='ij')
+    return dict((name, grid.ravel()) for name, grid in zip(names, grids))
+
+
+def sweep(boxType, ranges, batchSize=BATCH_SIZE):
+    """
+    evaluates all combinations of the parameter ranges (a dict of sequences, the other parameters
+    take their defaults), returns a NumPy structured array with a row per combination
+    """
+    template = compileTemplate(boxType)
+    combinations = sweepColumns(ranges)
+    count = len(next(iter(combinations.values()))) if combinations else 1
+    partNames = ['part%d' % i for i in range(len(template.parts))]
+    fields = [(name, np.asarray(column).dtype) for name, column in combinations.items()] + \
+             [(name, float) for name in ('sheetWidth', 'sheetHeight', 'sheetArea', 'partsArea', 'cutLength')] + \
+             [('tabs', np.intp), ('valid', bool), ('validDimensions', bool), ('validTabs', bool),
+              ('validGeometry', bool)] + \
+             [(name + suffix, float) for name in partNames for suffix in ('Width', 'Height')]
+    table = np.zeros(count, dtype=fields)
+
+    for begin in range(0, count, batchSize):
+        # invalid parameters give nan or inf (inkex makes numpy raise on them), the rows are marked invalid
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rows = slice(begin, min(begin + batchSize, count))
+            params = dict((name, column[rows]) for name, column in combinations.items())
+            columns = template.columns(params)[0]
+            size = rows.stop - rows.start
+            cache = {}
+            sheet = Bounds(size)
+            tabs = np.zeros(size, dtype=np.intp)
+            fewestTabs = np.full(size, np.iinfo(np.intp).max)
+            outlines = []
+            for name, part in zip(partNames, template.parts):
+                if isinstance(part, CircleTemplate):
+                    r, center = part.evaluateBatch(columns, size, cache)
+                    bounds = Bounds(size)
+                    bounds.include(center - r[:, None])
+                    bounds.include(center + r[:, None])
+                    bounds.length = 2.0 * math.pi * r
+                else:
+                    bounds, partTabs, partFewest, closed = pathMetrics(part, columns, size, cache)
+                    tabs += partTabs
+                    fewestTabs = np.minimum(fewestTabs, partFewest)
+                    outlines.append((bounds, closed))
+                partSize = bounds.hi - bounds.lo
+                table[name + 'Width'][rows] = partSize[:, 0]
+                table[name + 'Height'][rows] = partSize[:, 1]
+                sheet.include(bounds.lo)
+                sheet.include(bounds.hi)
+                sheet.length += bounds.length
+
+            # the closed paths within another closed path are holes
+            partsArea = np.zeros(size)
+            for i, (bounds, closed) in enumerate(outlines):
+                inner = np.zeros(size, dtype=bool)
+                for j, (other, otherClosed) in enumerate(outlines):
+                    if j != i:
+                        inner |= otherClosed & (other.lo <= bounds.lo).all(axis=1) & \
+                                 (bounds.hi <= other.hi).all(axis=1)
+                partSize = bounds.hi - bounds.lo
+                partsArea += np.where(closed & ~inner, partSize[:, 0] * partSize[:, 1], 0.0)
+
+            for name, column in params.items():
+                table[name][rows] = column
+            extent = sheet.hi - sheet.lo
+            table['sheetWidth'][rows] = extent[:, 0]
+            table['sheetHeight'][rows] = extent[:, 1]
+            table['sheetArea'][rows] = extent[:, 0] * extent[:, 1]
+            table['partsArea'][rows] = partsArea
+            table['cutLength'][rows] = sheet.length
+            table['tabs'][rows] = tabs
+
+            thickness = np.broadcast_to(columns['thickness'], size)
+            validDimensions = (thickness > 0) & (np.broadcast_to(columns['frameLength'], size) > 0) & \
+                              (np.broadcast_to(columns['boxWidth'], size) > 2 * thickness) & \
+                              (np.broadcast_to(columns['boxDepth'], size) > 2 * thickness) & \
+                              (np.broadcast_to(columns['boxHeight'], size) > thickness)
+            validTabs = fewestTabs >= 1
+            validGeometry = np.isfinite(sheet.length) & np.isfinite(extent).all(axis=1)
+            table['validDimensions'][rows] = validDimensions
+            table['validTabs'][rows] = validTabs
+            table['validGeometry'][rows] = validGeometry
+            table['valid'][rows] = validDimensions & validTabs & validGeometry
+    return table
+
+
+def writeCSV(table, out):
+    out.write(','.join(table.dtype.names) + '\n')
+    formats = ['%d' if table.dtype[name].kind in 'iub' else '%.6g' for name in table.dtype.names]
+    np.savetxt(out, table, fmt=formats, delimiter=',')
+
+
+def parseRange(text):
+    """values of start:stop:count (stop included) or a comma separated list"""
+    if ':' in text:
+        start, stop, count = text.split(':')
+        return np.linspace(float(start), float(stop), int(count))
+    return np.array([float(value) for value in text.split(',')])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='design space sweep of a box type')
+    parser.add_argument('--boxType', default='withHinge')
+    parser.add_argument('--out', default=None, help='csv file (default: standard output)')
+    for name, default in BoxParameters._field_defaults.items():
+        if isinstance(default, (int, float)) and not isinstance(default, bool):
+            parser.add_argument('--' + name, type=parseRange, default=None)
+    options = vars(parser.parse_args())
+    ranges = dict((name, values) for name, values in options.items()
+                  if name not in ('boxType', 'out') and values is not None)
+    for name in ranges:
+        if isinstance(BoxParameters._field_defaults[name], int):
+            ranges[name] = ranges[name].astype(int)
+
+    table = sweep(options['boxType'], ranges)
+    if options['out']:
+        with open(options['out'], 'w') as out:
+            writeCSV(table, out)
+    else:
+        writeCSV(table, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+#! /usr/bin/env python
+"""
+boxmakerNTemplates.py
+Parametric templates of the box parts.
+
+The structure of the parts drawn by BoxGenerator.drawBoxParts (which segments in which order,
+the hinge branches) depends only on the box type, just their numbers depend on the dimensions.
+compileTemplate records drawBoxParts once with symbolic parameters: every number becomes an
+Expression over the parameters and every row of tabs a frames step whose tab count is an
+expression, too. The template then evaluates for any parameters without running the drawing
+code again, evaluateBatch does this for many parameter sets at once with NumPy.
+
+    template = compileTemplate('withHinge')
+    parts = template.evaluate(BoxParameters(boxType='withHinge', boxWidth=150.0))
+    batch = template.evaluateBatch({'boxWidth': np.linspace(100, 300, 1000)})
+"""
+
+import math
+import numpy as np
+from boxmakerNLib import BoxGenerator, BoxParameters, Part, PathArray, Point, SVGPathAtom, Move, move, circleArc, \
+    OP_MOVE, OP_MOVE_REL, OP_LINE, OP_ARC, EPSILON
+
+
+class Expression:
+    """a number of a template: a parameter or an operation on expressions and constants"""
+    __slots__ = ('op', 'args')
+
+    def __init__(self, op, *args):
+        self.op = op
+        self.args = args
+
+    @staticmethod
+    def parameter(name):
+        return Expression(None, name)
+
+    def __add__(self, other):
+        return Expression(np.add, self, other)
+
+    def __radd__(self, other):
+        return Expression(np.add, other, self)
+
+    def __sub__(self, other):
+        return Expression(np.subtract, self, other)
+
+    def __rsub__(self, other):
+        return Expression(np.subtract, other, self)
+
+    def __mul__(self, other):
+        return Expression(np.multiply, self, other)
+
+    def __rmul__(self, other):
+        return Expression(np.multiply, other, self)
+
+    def __truediv__(self, other):
+        return Expression(np.true_divide, self, other)
+
+    def __rtruediv__(self, other):
+        return Expression(np.true_divide, other, self)
+
+    def __pow__(self, other):
+        return Expression(np.power, self, other)
+
+    def __neg__(self):
+        return Expression(np.negative, self)
+
+    def __floor__(self):
+        return Expression(np.floor, self)
+
+
+def evaluate(value, columns, cache):
+    """the value of an expression (or constant) for the parameter columns, cache holds shared subexpressions"""
+    if not isinstance(value, Expression):
+        return value
+    key = id(value)
+    if key not in cache:
+        if value.op is None:
+            cache[key] = columns[value.args[0]]
+        else:
+            cache[key] = value.op(*[evaluate(arg, columns, cache) for arg in value.args])
+    return cache[key]
+
+
+class frames(SVGPathAtom):
+    """a row of tabs (BoxGenerator.boxFrames) with symbolic length, recorded as one step"""
+
+    def __init__(self, nrFrames, startEnd, half, first, second, inverse, walkIn, walkOut, end):
+        self.nrFrames = nrFrames
+        self.startEnd = startEnd
+        self.half = half
+        # the lines into and out of a tab
+        self.first = first
+        self.second = second
+        self.inverse = inverse
+        self.walkIn = walkIn
+        self.walkOut = walkOut
+        self.end = end
+
+    def newPos(self, start_pos):
+        return start_pos.add(self.end.x, self.end.y)
+
+
+class SimplifiedPath(list):
+    """a recorded path to be simplified after evaluation"""
+
+    def finalPosition(self):
+        pos = Point(0, 0)
+        for atom in self:
+            pos = atom.newPos(pos)
+        return pos
+
+
+class TemplateRecorder(BoxGenerator):
+    """a BoxGenerator with symbolic parameters recording the parts of drawBoxParts"""
+
+    def __init__(self, boxType):
+        symbols = dict((name, Expression.parameter(name)) for name, default in BoxParameters._field_defaults.items()
+                       if isinstance(default, (int, float)) and not isinstance(default, bool))
+        BoxGenerator.__init__(self, BoxParameters(boxType=boxType, **symbols))
+        self.templates = []
+
+    def boxFrames(self, length, direction, inverse=False, depth=None):
+        # the same numbers as BoxGenerator.boxFrames, only the tab count stays an expression
+        if depth is None:
+            depth = self.thickness
+        nrInOutFrames = math.floor((length - (self.frameEdgesMin * 2) - self.frameLength) / self.frameLength)
+        nrFrames = math.floor(nrInOutFrames / 2)
+        remainder = (length - ((nrFrames * 2) * self.frameLength)) / 2.0
+
+        frameMoveHalf = Point(direction['frameMove'][0] * self.frameLength / 2.0,
+                              direction['frameMove'][1] * self.frameLength / 2.0)
+        walkIn = Point(direction['walkIn'][0] * depth, direction['walkIn'][1] * depth)
+        walkOut = Point(direction['walkOut'][0] * depth, direction['walkOut'][1] * depth)
+        startEnd = Point(direction['frameMove'][0] * remainder, direction['frameMove'][1] * remainder)
+        end = Point(direction['frameMove'][0] * length, direction['frameMove'][1] * length)
+        if inverse:
+            first, second = walkOut, walkIn
+        else:
+            first, second = walkIn, walkOut
+        return [frames(nrFrames, startEnd, frameMoveHalf, first, second, inverse, walkIn, walkOut, end)]
+
+    def simplified(self, path):
+        return SimplifiedPath(path)
+
+    def insertPath(self, path, color='black'):
+        self.templates.append(PathTemplate(list(path), color, isinstance(path, SimplifiedPath)))
+
+    def insertCircle(self, r, center, color='black'):
+        self.templates.append(CircleTemplate(r, center, color))
+
+    def markPoints(self, center, color='red'):
+        pass
+
+    # parts depending on the dimensions in their structure are not part of the template
+    def drawShelfFrames(self, start):
+        pass
+
+    def draw_linehelves(self, start):
+        pass
+
+    def drawLivingHingeLid(self, start):
+        pass
+
+    def drawGridDividers(self, start):
+        pass
+
+    def drawMobileSupports(self, topStart):
+        pass
+
+
+class CircleTemplate:
+    def __init__(self, r, center, color):
+        self.r = r
+        self.center = center
+        self.color = color
+
+    def evaluateBatch(self, columns, count, cache):
+        """radii and centers (count x 2) of the circle"""
+        r = np.broadcast_to(evaluate(self.r, columns, cache), count).astype(float)
+        center = np.stack([np.broadcast_to(evaluate(value, columns, cache), count).astype(float)
+                           for value in (self.center.x, self.center.y)], axis=1)
+        return r, center
+
+
+class PathTemplate:
+    def __init__(self, steps, color, simplify):
+        self.steps = steps
+        self.color = color
+        self.simplify = simplify
+
+    def tabCounts(self, columns, count, cache):
+        """the number of tabs of every frames step (count x steps)"""
+        return np.stack([np.broadcast_to(np.maximum(evaluate(step.nrFrames, columns, cache), 0), count)
+                         for step in self.steps if isinstance(step, frames)], axis=1).astype(np.intp)
+
+    def evaluateBatch(self, columns, count, cache):
+        """a PathArray with one path per parameter set"""
+
+        def values(point):
+            return [np.broadcast_to(evaluate(value, columns, cache), count).astype(float)
+                    for value in (point.x, point.y)]
+
+        # number of atoms of every step per parameter set
+        sizes = np.ones((count, len(self.steps)), dtype=np.intp)
+        for i, step in enumerate(self.steps):
+            if isinstance(step, frames):
+                tabs = np.broadcast_to(np.maximum(evaluate(step.nrFrames, columns, cache), 0), count)
+                sizes[:, i] = 2 + 6 * tabs.astype(np.intp) + (2 if step.inverse else 0)
+        ends = np.cumsum(sizes.ravel()).reshape(count, len(self.steps))
+        starts = ends - sizes
+        total = ends[-1, -1] if count else 0
+        ops = np.full(total, OP_LINE, dtype=np.uint8)
+        xy = np.zeros((total, 2))
+        arc = np.zeros((total, 3))
+
+        for i, step in enumerate(self.steps):
+            first = starts[:, i]
+            if isinstance(step, frames):
+                owner = np.repeat(np.arange(count), sizes[:, i])
+                # index of the atom in its row of tabs
+                j = np.arange(len(owner)) - np.repeat(np.cumsum(sizes[:, i]) - sizes[:, i], sizes[:, i])
+                last = sizes[owner, i] - 1
+                if step.inverse:
+                    j = j - 1
+                    last = last - 2
+                # pattern of a tab: half, first, half, half, second, half
+                k = (j - 1) % 6
+                choices = [values(step.half), values(step.first), values(step.second), values(step.startEnd)]
+                which = np.where((j == 0) | (j == last), 3, np.where(k == 1, 1, np.where(k == 4, 2, 0)))
+                if step.inverse:
+                    choices += [values(step.walkIn), values(step.walkOut)]
+                    which = np.where(j == -1, 4, np.where(j == last + 1, 5, which))
+                for axis in range(2):
+                    table = np.stack([choice[axis] for choice in choices], axis=1)
+                    xy[first[owner] + j + (1 if step.inverse else 0), axis] = table[owner, which]
+            elif isinstance(step, circleArc):
+                ops[first] = OP_ARC
+                xy[first, 0], xy[first, 1] = values(step.endPoint)
+                arc[first, 0] = np.broadcast_to(evaluate(step.r, columns, cache), count)
+                arc[first, 1] = int(step.largeArc)
+                arc[first, 2] = int(step.sweepFlag)
+            else:
+                ops[first] = OP_MOVE if isinstance(step, Move) else OP_MOVE_REL if isinstance(step, move) else OP_LINE
+                xy[first, 0], xy[first, 1] = values(step.p)
+
+        offsets = np.concatenate(([0], ends[:, -1])).astype(np.intp)
+        result = PathArray(ops, xy, arc, offsets)
+        return result.simplify(EPSILON) if self.simplify else result
+
+
+class BoxTemplate:
+    """the recorded parts of a box type, evaluated for any parameters"""
+
+    def __init__(self, boxType, parts):
+        self.boxType = boxType
+        self.parts = parts
+
+    def columns(self, params):
+        """parameter columns (arrays) of a dict of values or arrays, defaults for the missing ones"""
+        columns = dict((name, np.asarray(params.get(name, default)))
+                       for name, default in BoxParameters._field_defaults.items())
+        count = max([column.size for column in columns.values() if column.ndim] or [1])
+        return columns, count
+
+    def evaluateBatch(self, params):
+        """
+        evaluates the parts for many parameter sets (a dict of arrays of equal length, missing parameters
+        take their defaults), returns a PathArray (one path per set) or radii and centers per part
+        """
+        columns, count = self.columns(params)
+        cache = {}
+        return [part.evaluateBatch(columns, count, cache) for part in self.parts]
+
+    def evaluate(self, params):
+        """the Parts for BoxParameters, as drawn by BoxGenerator.drawBoxParts"""
+        result = []
+        for part, value in zip(self.parts, self.evaluateBatch(params._asdict())):
+            if isinstance(part, CircleTemplate):
+                r, center = value
+                result.append(Part(None, part.color, float(r[0]), Point(*center[0].tolist())))
+            else:
+                result.append(Part(value, part.color))
+        return result
+
+
+def compileTemplate(boxType, start=Point(10, 10)):
+    """records the parts of the box type (drawn at start) as template"""
+    recorder = TemplateRecorder(boxType)
+    recorder.drawBoxParts(start)
+    return BoxTemplate(boxType, recorder.templates)
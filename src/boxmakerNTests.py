@@ -1,6 +1,26 @@
+import http.client
+import io
+import json
+import os
+import tempfile
+import threading
 import unittest
-from boxmakerNLib import BoxMaker, line, Path, Point, circleArc, Move
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from lxml import etree
+from boxmakerNLib import BoxMaker, BoxGenerator, BoxParameters, line, Path, Point, circleArc, Move, Direction, PathArray, Part, kerfCompensate, \
+    FixedPoint, flattenParts, OP_LINE, OP_ARC, livingHingeSlits, \
+    dividerOutline, cutMetrics, reliefCorners, affine, localParts, placeParts, parametersFromJson
+from boxmakerNTemplates import compileTemplate
+from boxmakerNSweep import sweep
+import boxmakerNBinary
+from boxmakerNBinary import GeometryFile, writeJob
+from boxmakerNStream import writeBoxes
+from boxmakerNWatch import SpecWatcher
+from boxmakerNService import GenerationService, ServiceClient, makeServer
 import inkex
+import numpy as np
 
 
 class TestBoxMaker(unittest.TestCase):
@@ -16,6 +36,32 @@ class TestBoxMaker(unittest.TestCase):
 
         self.assertEqual(2, len(test_path.simplify()))
 
+    def test_simplifyTolerance(self):
+        test_path = Path()
+        test_path.MoveTo(Point(0, 0))
+        test_path.append(line(Point(3, 4)))
+        test_path.append(line(Point(1e-9, 0)))
+        test_path.append(line(Point(6, 8 + 1e-9)))
+        test_path.append(circleArc(5.0, Point(5, 5), '0', '1'))
+        test_path.append(circleArc(5.0, Point(-5, 5), '0', '1'))
+        test_path.append(line(Point(0, 10)))
+
+        simplified = test_path.simplify()
+        self.assertEqual(4, len(simplified))
+        self.assertAlmostEqual(9.0, simplified[1].p.x)
+        self.assertAlmostEqual(12.0, simplified[1].p.y)
+        # two quarter circles make a half circle
+        self.assertAlmostEqual(0.0, simplified[2].endPoint.x)
+        self.assertAlmostEqual(10.0, simplified[2].endPoint.y)
+        # the pass over the atoms and the one over the arrays agree
+        self.assertEqual(PathArray.fromPaths([test_path]).simplify().toPaths()[0].translateToSVGd(),
+                         simplified.translateToSVGd())
+        circle = Path([Move(Point(0, 0))] + [circleArc(5.0, Point(5, 5), '0', '1'),
+                                             circleArc(5.0, Point(-5, 5), '0', '1'),
+                                             circleArc(5.0, Point(-5, -5), '0', '1'),
+                                             circleArc(5.0, Point(5, -5), '0', '1')])
+        self.assertEqual(5, len(circle.simplify()))
+
     def test_roundedEdges(self):
         test_path = Path();
 
@@ -61,6 +107,477 @@ class TestBoxMaker(unittest.TestCase):
 
         test_path.simplify()
 
+    def test_fixedPoint(self):
+        test_path = Path()
+        test_path.MoveTo(Point(0, 0))
+        for i in range(1000):
+            test_path.lineBy(Point(0.1, 0))
+        test_path.lineBy(Point(0, 0.3))
+        test_path.lineBy(Point(-100, 0))
+        test_path.lineBy(Point(0, -0.1))
+        test_path.lineBy(Point(0, -0.2))
+
+        self.assertNotEqual(Point(0, 0), test_path.finalPosition())
+        fixed = test_path.toFixed()
+        self.assertEqual(FixedPoint(0, 0), fixed.finalPosition())
+        self.assertEqual(1, len({fixed.finalPosition(), FixedPoint(0, 0), FixedPoint(1e-9, 0)}))
+        self.assertEqual(5, len(fixed.simplify()))
+
+        rounded = fixed.addRoundedEdgesAt(0.1, [Point(100, 0), Point(100, 0.3)])
+        self.assertEqual(1007, len(rounded))
+
+    def test_pathArray(self):
+        test_path = Path()
+        test_path.MoveTo(Point(10, 10))
+        test_path.lineBy(Point(5, 0))
+        test_path.append(circleArc(2.0, Point(2, 2), '0', '1'))
+        test_path.lineBy(Point(0, 5))
+
+        arr = PathArray.fromPaths([test_path, test_path])
+        self.assertEqual(2, len(arr))
+        self.assertEqual((17.0, 17.0), tuple(arr.positions()[-1]))
+        self.assertEqual(test_path.translateToSVGd(), arr.toPaths()[1].translateToSVGd())
+        # the views of split are passed on without converting them again
+        self.assertIs(arr, PathArray.fromPaths(arr.split()))
+        self.assertIsNot(arr, PathArray.fromPaths(arr.split()[::-1]))
+        self.assertEqual(arr.split()[1].translateToSVGd(), arr.take([1, 0]).split()[0].translateToSVGd())
+
+    def test_flatten(self):
+        test_path = Path()
+        test_path.MoveTo(Point(0, 0))
+        test_path.lineBy(Point(10, 0))
+        test_path.append(circleArc(10.0, Point(0, 20), '0', '1'))
+        parts = flattenParts([Part(test_path), Part(None, 'green', 1.0, Point(5, 5))], 0.01)
+
+        arr = PathArray.fromPaths([parts[0].path])
+        self.assertTrue((arr.ops[1:] == OP_LINE).all())
+        # a chord of pi / n deviates 10 * (1 - cos(pi / 2n)) from the half circle, n = 36 keeps it below 0.01
+        self.assertEqual(2 + 36, len(arr.ops))
+        positions = arr.positions()
+        self.assertAlmostEqual(20.0, positions[-1][1])
+        distances = np.hypot(positions[2:, 0] - 10, positions[2:, 1] - 10)
+        self.assertTrue(np.allclose(distances, 10.0))
+        self.assertEqual(1 + 2 * 12, len(parts[1].path.ops))
+
+    def test_kerf(self):
+        outline = Path()
+        outline.MoveTo(Point(0, 0))
+        outline.lineBy(Point(20, 0))
+        outline.lineBy(Point(0, 20))
+        outline.lineBy(Point(-20, 0))
+        outline.lineBy(Point(0, -20))
+        # a slot drawn the other way round
+        slot = Path()
+        slot.MoveTo(Point(5, 5))
+        slot.lineBy(Point(0, 4))
+        slot.lineBy(Point(10, 0))
+        slot.lineBy(Point(0, -4))
+        slot.lineBy(Point(-10, 0))
+
+        parts = kerfCompensate([Part(outline), Part(slot), Part(None, 'green', 2.0, Point(10, 15))], 0.2)
+
+        self.assertEqual('M -0.100000 -0.100000 l 20.200000 0.000000 l 0.000000 20.200000 '
+                         'l -20.200000 0.000000 l 0.000000 -20.200000 ', parts[0].path.translateToSVGd())
+        self.assertEqual('M 5.100000 5.100000 l 0.000000 3.800000 l 9.800000 0.000000 '
+                         'l 0.000000 -3.800000 l -9.800000 0.000000 ', parts[1].path.translateToSVGd())
+        self.assertAlmostEqual(1.9, parts[2].r)
+
+        # the compensated parts stay in the order of the drawing, between the texts
+        generator = BoxGenerator(BoxParameters(boxType='mobileLoader', kerf=0.2, debug=True))
+        tags = [tag for tag, attributes, text in generator.generate()]
+        info = [i for i, (tag, attributes, text) in enumerate(generator.elements) if tag == 'text'
+                and text.startswith('Mobile Stand')][0]
+        self.assertEqual(['path', 'text', 'path'], tags[info - 1:info + 2])
+
+    def test_livingHinge(self):
+        slits = livingHingeSlits(Point(0, 0), 100, 10, 20, 3, 2)
+        # one compound path, 5 rows alternating 5 and 4 slits
+        self.assertEqual(1, len(slits))
+        self.assertEqual(2 * 23, len(slits.ops))
+        pos = slits.positions()
+        self.assertTrue((pos[:, 0] >= 3).all() and (pos[:, 0] <= 97).all())
+        self.assertTrue((np.abs(slits.xy[1::2, 0]) >= 3).all())
+        self.assertEqual(sorted({1.0, 3.0, 5.0, 7.0, 9.0}), sorted(set(pos[:, 1].tolist())))
+
+    def test_gridDividers(self):
+        outline = dividerOutline(100, 40, [30, 60], 4, True)
+        self.assertEqual(1 + 2 * 4 + 4, len(outline.ops))
+        pos = outline.positions()
+        self.assertEqual((0.0, 0.0), tuple(pos[-1]))
+        self.assertEqual([30.0, 30.0, 34.0, 34.0], pos[1:5, 0].tolist())
+        self.assertEqual([0.0, 20.0, 20.0, 0.0], pos[1:5, 1].tolist())
+
+        copies = outline.repeat([(10, 0), (10, 50), (10, 100)])
+        self.assertEqual(3, len(copies))
+        for i, copy in enumerate(copies.split()):
+            self.assertTrue(np.allclose(pos + (10, 50 * i), copy.positions()))
+
+        boxMaker = BoxMaker()
+        boxMaker.gridColumns = 4
+        boxMaker.gridRows = 3
+        boxMaker.drawGridDividers(Point(10, 10))
+        self.assertEqual(3 + 2, len(boxMaker.parts))
+
+    def test_concurrentGeneration(self):
+        date = datetime(2024, 5, 1, 12, 0)
+        paramSets = [BoxParameters(boxType=boxType, boxWidth=width, shelfCount=3, kerf=kerf, debug=debug)
+                     for boxType in ('withHinge', 'openBox', 'mobileLoader', 'openBoxWithShelves', 'livingHinge',
+                                     'gridBox')
+                     for width, kerf, debug in ((200.0, 0.0, True), (150.0, 0.2, False))]
+
+        def generate(params):
+            layer = etree.Element('g')
+            generator = BoxGenerator(params, date)
+            generator.generate()
+            generator.writeTo(layer)
+            return etree.tostring(layer)
+
+        expected = [generate(params) for params in paramSets]
+        self.assertEqual(len(expected), len(set(expected)))
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            self.assertEqual(expected * 8, list(pool.map(generate, paramSets * 8)))
+
+    def test_serviceCoalescing(self):
+        release = threading.Event()
+        calls = []
+
+        def generate(params):
+            calls.append(params)
+            release.wait(10)
+            return b'<svg/>'
+
+        service = GenerationService(cacheSize=2, generate=generate)
+        params = parametersFromJson({'boxType': 'openBox', 'boxWidth': 150})
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = [pool.submit(service.get, params) for i in range(4)]
+            while service.metrics()['coalesced'] < 3:
+                release.wait(0.01)
+            release.set()
+            self.assertEqual([b'<svg/>'] * 4, [result.result() for result in results])
+        self.assertEqual(b'<svg/>', service.get(params))
+        metrics = service.metrics()
+        self.assertEqual(1, len(calls))
+        self.assertEqual((5, 1, 3, 1), (metrics['requests'], metrics['generated'], metrics['coalesced'],
+                                        metrics['cacheHits']))
+        with self.assertRaises(ValueError):
+            parametersFromJson({'boxWidth': 'wide'})
+        with self.assertRaises(ValueError):
+            parametersFromJson({'width': 100})
+        for name in ('boxType', 'outputMode', 'cornerRelief', 'placement'):
+            with self.assertRaises(ValueError):
+                parametersFromJson({name: 'unknown'})
+        self.assertEqual('tbone', parametersFromJson({'cornerRelief': 'tbone'}).cornerRelief)
+
+    def test_service(self):
+        server = makeServer(GenerationService(), port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = ServiceClient(port=server.server_address[1])
+        try:
+            svg = client.generate(boxType='gridBox', gridColumns=4, gridRows=4)
+            self.assertEqual(svg, client.generate(boxType='gridBox', gridColumns=4, gridRows=4))
+            self.assertEqual(5 + 3 + 3, svg.count(b'<path'))
+            with self.assertRaises(RuntimeError):
+                client.generate(boxType='gridBox', gridColumns=4.5)
+            with self.assertRaises(RuntimeError) as error:
+                client.generate(boxType='gridbox')
+            self.assertTrue(str(error.exception).startswith('400 boxType has to be one of'))
+            connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=60)
+            connection.putrequest('POST', '/generate')
+            connection.putheader('Content-Length', 'many')
+            connection.endheaders()
+            self.assertEqual(400, connection.getresponse().status)
+            connection.close()
+            self.assertEqual(1, client.metrics()['cacheHits'])
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+
+    def test_templates(self):
+        def svg(parts):
+            return [part.path.translateToSVGd() if part.path is not None else (part.r, part.center) for part in parts]
+
+        for boxType in ('withHinge', 'openBox'):
+            template = compileTemplate(boxType)
+            for changes in ({}, {'boxWidth': 123.4, 'thickness': 3.3, 'hingeCircleFactor': 2.2},
+                            {'frameLength': 7.0, 'frameEdgesMin': 1.0}, {'frameLength': 500.0}):
+                params = BoxParameters(boxType=boxType, **changes)
+                generator = BoxGenerator(params)
+                generator.drawBoxParts(Point(10, 10))
+                self.assertEqual(svg(generator.parts), svg(template.evaluate(params)))
+
+        widths = [100.0, 150.0, 333.0]
+        batch = template.evaluateBatch({'boxWidth': np.array(widths)})
+        for i, width in enumerate(widths):
+            parts = template.evaluate(BoxParameters(boxType='openBox', boxWidth=width))
+            self.assertEqual([part.path.translateToSVGd() for part in parts],
+                             [paths.split()[i].translateToSVGd() for paths in batch])
+
+    def test_sweep(self):
+        table = sweep('openBox', {'boxWidth': [100.0, 250.0], 'thickness': [3.0, 4.0], 'frameLength': [10.0, 500.0]})
+        self.assertEqual(8, len(table))
+        for row in table:
+            params = BoxParameters(boxType='openBox', boxWidth=float(row['boxWidth']),
+                                   thickness=float(row['thickness']), frameLength=float(row['frameLength']))
+            generator = BoxGenerator(params)
+            generator.drawBoxParts(Point(10, 10))
+            for i, part in enumerate(generator.parts):
+                positions = PathArray.fromPaths([part.path]).positions()
+                self.assertAlmostEqual(np.ptp(positions[:, 0]), row['part%dWidth' % i])
+                self.assertAlmostEqual(np.ptp(positions[:, 1]), row['part%dHeight' % i])
+            flat = PathArray.concatenate([part.path for part in flattenParts(generator.parts, 0.001)])
+            cuts = flat.xy[flat.ops == OP_LINE]
+            self.assertAlmostEqual(np.hypot(cuts[:, 0], cuts[:, 1]).sum(), row['cutLength'], places=4)
+            # the separator lines are open, only the outlines count (without tabs the sides are open too)
+            if row['valid']:
+                self.assertAlmostEqual(sum(np.prod(np.ptp(PathArray.fromPaths([part.path]).positions(), axis=0))
+                                           for part in generator.parts if part.color == 'black'), row['partsArea'])
+            self.assertEqual(row['frameLength'] < 100.0, bool(row['validTabs']))
+            self.assertEqual(row['validTabs'], row['valid'])
+
+        # inkex makes numpy raise on invalid values, rows without geometry are just invalid
+        table = sweep('withHinge', {'frameLength': [0.0, 10.0], 'hingeCircleFactor': [0.3, 1.5]})
+        self.assertEqual([False, False, False, True], table['valid'].tolist())
+        self.assertEqual([False, False, False, True], table['validGeometry'].tolist())
+        # without the hinge circles and the separator lines
+        row = table[3]
+        self.assertAlmostEqual(sum(row['part%dWidth' % i] * row['part%dHeight' % i] for i in (0, 4, 6, 7)),
+                               row['partsArea'])
+
+    def test_cutMetrics(self):
+        generator = BoxGenerator(BoxParameters(cutSpeed=10.0, travelSpeed=100.0, pierceTime=1.0))
+        generator.insertRect(Point(10, 0), 20, 10)
+        generator.insertCircle(5, Point(40, 0), 'red')
+        generator.flushParts()
+        cutLength, pierces, travel, head = cutMetrics([Part(None, 'red', 5, Point(40, 0))], (10, 0))
+        self.assertAlmostEqual(10 * np.pi, cutLength[0])
+        self.assertEqual(35.0, travel[0])
+
+        metrics = generator.metrics()
+        self.assertEqual((60.0, 1, 10.0), tuple(metrics['parts'][0][name] for name in ('cutLength', 'pierces', 'travel')))
+        self.assertAlmostEqual(60.0 + 10 * np.pi, metrics['total']['cutLength'])
+        self.assertEqual(2, metrics['total']['pierces'])
+        self.assertAlmostEqual(45.0, metrics['total']['travel'])
+        self.assertAlmostEqual(6.0 + 1.0 + 0.1 + np.pi + 1.0 + 0.35, metrics['total']['time'])
+        self.assertEqual(['black', 'red'], sorted(metrics['colors']))
+
+        elements = BoxGenerator(BoxParameters(boxType='openBox')).generate()
+        self.assertIn('machine time', elements[0][2])
+
+    def test_cornerRelief(self):
+        # a square with a tab on top and a slot
+        outline = Path()
+        outline.MoveTo(Point(0, 0))
+        for dx, dy in ((10, 0), (0, -5), (10, 0), (0, 5), (20, 0), (0, 40), (-40, 0), (0, -40)):
+            outline.lineBy(Point(dx, dy))
+        generator = BoxGenerator()
+        generator.insertPath(outline)
+        generator.insertRect(Point(10, 10), 10, 10)
+        generator.insertCircle(3, Point(30, 30))
+
+        concave = [(10, 0), (20, 0), (10, 10), (20, 10), (20, 20), (10, 20)]
+        for style, cut in (('dogbone', 2 ** 0.5), ('tbone', 2.0)):
+            parts = reliefCorners(generator.parts, 1.0, style)
+            self.assertEqual(3, parts[2].r)
+            self.assertEqual([2, 4], [int((part.path.ops == OP_ARC).sum()) for part in parts[:2]])
+            flat = PathArray.fromPaths([part.path for part in parts[:2]]).flatten(0.0001).positions()
+            for corner in concave:
+                self.assertLess(np.hypot(*(flat - corner).T).min(), 0.001)
+            # the convex corners are kept, the lines shortened by the relief
+            self.assertTrue(np.any(np.all(np.abs(flat - (10, -5)) < 1e-9, axis=1)))
+            self.assertAlmostEqual(10 - cut, parts[0].path.xy[1, 0])
+
+        # reliefs which do not fit are left out (a tool as large as the material thickness), overlapping
+        # ones at the bottom of narrow slots are joined: no outline crosses itself more than without relief
+        for boxType, thickness, radius in (('openBox', 3.0, 3.0), ('gridBox', 3.0, 3.0), ('gridBox', 4.0, 1.9),
+                                           ('mobileLoader', 4.0, 1.9)):
+            plain = BoxGenerator(BoxParameters(boxType=boxType, thickness=thickness))
+            plain.generate()
+            relieved = BoxGenerator(BoxParameters(boxType=boxType, thickness=thickness, cornerRelief='dogbone',
+                                                  toolRadius=radius))
+            relieved.generate()
+            for before, after in zip(plain.placed, relieved.placed):
+                if before.path is not None:
+                    self.assertEqual(self.crossings(before.path), self.crossings(after.path))
+        slot = relieved.placed[-3].path
+        self.assertEqual(0, int((np.abs(slot.xy[slot.ops == OP_LINE]).sum(axis=1) < 4.0).sum()))
+
+    def crossings(self, path):
+        """the number of points where the flattened path crosses itself"""
+        arr = PathArray.fromPaths([path]).flatten(0.001)
+        pos = arr.positions()
+        segments = arr.ops != 0
+        p = arr.startPositions(pos)[segments]
+        d = pos[segments] - p
+        r = p[None, :, :] - p[:, None, :]
+        denominator = d[:, None, 0] * d[None, :, 1] - d[:, None, 1] * d[None, :, 0]
+        parallel = np.abs(denominator) < 1e-12
+        denominator = np.where(parallel, 1.0, denominator)
+        t = (r[:, :, 0] * d[None, :, 1] - r[:, :, 1] * d[None, :, 0]) / denominator
+        u = (r[:, :, 0] * d[:, None, 1] - r[:, :, 1] * d[:, None, 0]) / denominator
+        inner = (t > 1e-6) & (t < 1 - 1e-6) & (u > 1e-6) & (u < 1 - 1e-6) & ~parallel
+        return int(inner.sum()) // 2
+
+    def test_placement(self):
+        generator = BoxGenerator(BoxParameters(boxType='mobileLoader'))
+        generator.drawBox()
+        generator.drawMobileLoader()
+        parts = generator.parts
+        local = localParts(parts)
+        self.assertEqual([part.path.translateToSVGd() for part in parts if part.path is not None],
+                         [part.path.translateToSVGd() for part in placeParts(local) if part.path is not None])
+
+        # turned and mirrored parts are the same as their turned and mirrored points
+        for matrix in (affine(5.0, 7.0, quarterTurns=1), affine(-3.0, 2.0, quarterTurns=2, mirror=True)):
+            for part in local:
+                part.transform = matrix @ part.transform
+            for before, after in zip(parts, placeParts(local)):
+                if before.path is None:
+                    center = matrix @ (before.center.x, before.center.y, 1.0)
+                    self.assertAlmostEqual(center[0], after.center.x)
+                    self.assertAlmostEqual(center[1], after.center.y)
+                    continue
+                points = PathArray.fromPaths([before.path]).flatten(0.001).positions()
+                expected = points @ matrix[:2, :2].T + matrix[:2, 2]
+                np.testing.assert_allclose(expected, PathArray.fromPaths([after.path]).flatten(0.001).positions(),
+                                           atol=1e-9)
+            for part in local:
+                part.transform = np.linalg.inv(matrix) @ part.transform
+
+        generator = BoxGenerator(BoxParameters(boxType='openBox', placement='transform'))
+        elements = generator.generate()
+        self.assertEqual(['M 0.000000 0.000000 ', 'translate(212.000000,14.000000)'],
+                         [elements[4][1]['d'][:20], elements[4][1]['transform']])
+        self.assertEqual(len(BoxGenerator(BoxParameters(boxType='openBox')).generate()), len(elements))
+
+    def test_binaryGeometry(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for params in (BoxParameters(boxType='livingHinge'), BoxParameters(boxType='gridBox', fixedPoint=True, kerf=0.1),
+                       BoxParameters(boxType='withHinge', placement='transform', fixedPoint=True)):
+            generator = BoxGenerator(params)
+            generator.generate()
+            fileName = os.path.join(directory.name, params.boxType + '.bxg')
+            writeJob(fileName, generator)
+            job = GeometryFile(fileName)
+            self.assertIsInstance(job.xy, np.memmap)
+            self.assertEqual(params.fixedPoint, job.xy.dtype.kind == 'i')
+            # the same path and circle elements as the generation run
+            self.assertEqual([element for element in generator.elements if element[0] != 'text'],
+                             job.elements().elements)
+            self.assertEqual(len(job), len(job.pathArray()) + sum(1 for part in generator.placed if part.path is None))
+            self.assertIn(b'<svg', job.toSVG())
+            self.assertEqual(params.placement == 'transform', job.transforms)
+        # the transforms are those of the parts, moved parts are written where they are now
+        generator.placed[0].transform = affine(5.0, 0.0, quarterTurns=1) @ generator.placed[0].transform
+        writeJob(fileName, generator)
+        self.assertTrue(np.array_equal(generator.placed[0].transform, GeometryFile(fileName).part(0).transform))
+        # called without a container, the command line tool exits with its usage
+        with mock.patch('sys.argv', ['boxmakerNBinary.py']):
+            with self.assertRaises(SystemExit) as exit:
+                boxmakerNBinary.main()
+        self.assertTrue(str(exit.exception.code).startswith('usage: python boxmakerNBinary.py job.bxg [job.svg]'))
+
+    def test_streamWriter(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        fileName = os.path.join(directory.name, 'boxes.svg')
+        paramSets = [BoxParameters(boxType='openBox', boxWidth=100.0 + 10 * i) for i in range(3)] + \
+                    [BoxParameters(boxType='livingHinge')]
+        self.assertEqual(4, writeBoxes(fileName, iter(paramSets), 500.0, 1200.0))
+        root = etree.parse(fileName).getroot()
+        self.assertEqual('0 0 500.000000 1200.000000', root.get('viewBox'))
+        self.assertEqual(4, len(root))
+        y = 0.0
+        for group, params in zip(root, paramSets):
+            generator = BoxGenerator(params)
+            generator.generate()
+            self.assertEqual('translate(0,%f)' % y, group.get('transform'))
+            self.assertEqual([(inkex.addNS(tag, 'svg'), attributes.get('d'), text is None)
+                              for tag, attributes, text in generator.elements],
+                             [(node.tag, node.get('d'), node.text is None) for node in group])
+            y += generator.extent[1]
+
+    def test_generateOnly(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        fileName = os.path.join(directory.name, 'drawing.svg')
+        with open(fileName, 'wb') as out:
+            out.write(b'<svg xmlns="http://www.w3.org/2000/svg" width="300mm" height="200mm" viewBox="0 0 600 400">'
+                      b'<g id="layer1"><rect x="1" y="1" width="3" height="3"/></g></svg>')
+        outputs = []
+        for mode in ('false', 'true'):
+            output = io.BytesIO()
+            BoxMaker().run(['--boxType=gridBox', '--thickness=4', '--frameEdgesMin=5', '--frameLength=10',
+                            '--generateOnly=' + mode, fileName], output)
+            outputs.append(output.getvalue())
+        # the document is passed through, the box group is appended to the root
+        with open(fileName, 'rb') as original:
+            self.assertTrue(outputs[1].startswith(original.read()[:-len(b'</svg>')]))
+        full, generated = [etree.fromstring(output) for output in outputs]
+        self.assertEqual('Box', generated[-1].get(inkex.addNS('label', 'inkscape')))
+        self.assertEqual([path.get('d') for path in full.iter(inkex.addNS('path', 'svg'))],
+                         [path.get('d') for path in generated[-1].iter(inkex.addNS('path', 'svg'))])
+
+    def test_watch(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        generated = []
+
+        def generate(params):
+            generated.append(params)
+            return ('<svg>%s</svg>' % params.boxWidth).encode()
+
+        def spec(name, data):
+            with open(os.path.join(directory.name, name), 'w') as out:
+                json.dump(data, out)
+
+        watcher = SpecWatcher(directory.name, debounce=1.0, generate=generate, log=lambda message: None)
+        watcher.start()
+        self.addCleanup(watcher.stop)
+        spec('a.json', {'boxWidth': 100})
+        spec('b.json', [{'boxType': 'openBox'}, {'boxWidth': 150}])
+        watcher.poll(0.0)
+        watcher.poll(0.5)
+        self.assertEqual([], generated)
+        watcher.poll(1.0)
+        watcher.wait()
+        self.assertEqual(['a.json', 'a.svg', 'b-0.svg', 'b-1.svg', 'b.json'], sorted(os.listdir(directory.name)))
+        self.assertEqual(3, len(generated))
+
+        # only the changed box is generated again, a removed box and spec remove their outputs
+        spec('b.json', [{'boxType': 'openBox'}, {'boxWidth': 160}, {'boxWidth': 170}])
+        os.remove(os.path.join(directory.name, 'a.json'))
+        watcher.poll(2.0)
+        watcher.poll(3.0)
+        watcher.wait()
+        self.assertEqual([160.0, 170.0], [params.boxWidth for params in generated[3:]])
+        self.assertEqual(['b-0.svg', 'b-1.svg', 'b-2.svg', 'b.json'], sorted(os.listdir(directory.name)))
+        with open(os.path.join(directory.name, 'b-1.svg')) as svg:
+            self.assertEqual('<svg>160.0</svg>', svg.read())
+        spec('b.json', [{'boxType': 'openBox'}])
+        watcher.poll(4.0)
+        watcher.poll(5.0)
+        self.assertEqual(['b-0.svg', 'b.json'], sorted(os.listdir(directory.name)))
+        self.assertEqual(5, watcher.counters['generated'])
+
+        # a spec replaced between listing the folder and reading its stat (an atomic save) keeps its outputs
+        class Vanishing:
+            def __init__(self, entry):
+                self.name = entry.name
+                self.is_file = entry.is_file
+                self.stat = entry.stat if entry.name != 'b.json' else self.vanished
+
+            def vanished(self):
+                raise FileNotFoundError(self.name)
+
+        scandir = os.scandir
+        with mock.patch('os.scandir', lambda path: [Vanishing(entry) for entry in scandir(path)]):
+            watcher.poll(6.0)
+            watcher.poll(7.0)
+        self.assertEqual(['b-0.svg', 'b.json'], sorted(os.listdir(directory.name)))
+        self.assertIn('b.json', watcher.params)
+
     def nontest_simplify(self):
         test_box_maker = BoxMaker()
         test_box_maker.boxWidth = 200.0
@@ -0,0 +1,215 @@
+#! /usr/bin/env python
+"""
+boxmakerNWatch.py
+Watches a folder of JSON box specs and keeps their svg layouts up to date.
+
+usage: python boxmakerNWatch.py specs [--out svgs] [--workers 2] [--queueSize 8] [--interval 0.5] [--debounce 0.3]
+
+A spec is a JSON object of box parameters (the fields of BoxParameters, lengths in mm), written to
+<name>.svg, or a list of them, written to <name>-<index>.svg. The folder is polled every interval
+seconds, a spec is read when it has not changed for debounce seconds (editors write files in steps).
+Its parameters are compared with those of the last run and only the boxes whose parameters changed
+are generated again, by a pool of workers taking the jobs from a bounded queue (polling waits while
+it is full). An output is only written if no newer version of it was queued meanwhile.
+Every output written is logged with its latency, from the change seen to the svg written.
+"""
+
+import argparse, json, os, queue, sys, threading, time
+from collections import deque
+from boxmakerNLib import BoxParameters, parametersFromJson
+from boxmakerNService import generateSVG
+
+
+def changedFields(old, new):
+    """the names of the parameters differing between two BoxParameters"""
+    return [name for name in BoxParameters._fields if getattr(old, name) != getattr(new, name)]
+
+
+class SpecWatcher:
+    """polls specDir and regenerates the outputs (in outDir) of the changed specs"""
+
+    def __init__(self, specDir, outDir=None, workers=2, queueSize=8, interval=0.5, debounce=0.3,
+                 generate=generateSVG, log=None, window=10000):
+        self.specDir = specDir
+        self.outDir = outDir or specDir
+        self.interval = interval
+        self.debounce = debounce
+        self.generate = generate
+        self.log = log or (lambda message: sys.stderr.write(message + '\n'))
+        # (mtime, size) of the specs, the time a change was seen first and last of the specs not read yet
+        self.stats = {}
+        self.firstChange = {}
+        self.lastChange = {}
+        # the parameters of the last run of every spec, the latest queued version of every output
+        self.params = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+        self.jobs = queue.Queue(maxsize=queueSize)
+        self.counters = {'generated': 0, 'skipped': 0, 'superseded': 0, 'errors': 0}
+        # latencies (in s) of the last window outputs written
+        self.latencies = deque(maxlen=window)
+        self.stopped = threading.Event()
+        self.workers = [threading.Thread(target=self.work, daemon=True) for i in range(workers)]
+
+    def outputs(self, name, count, isList):
+        base = os.path.join(self.outDir, name[:-len('.json')])
+        return ['%s-%d.svg' % (base, i) for i in range(count)] if isList else [base + '.svg']
+
+    def poll(self, now=None):
+        """one pass over the specs: notes the changes and reads the specs which are settled"""
+        now = time.monotonic() if now is None else now
+        stats = {}
+        listed = set()
+        for entry in os.scandir(self.specDir):
+            if entry.name.endswith('.json') and entry.is_file():
+                listed.add(entry.name)
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # replaced or deleted since the scan (atomic saves): unchanged until the next poll
+                    if entry.name in self.stats:
+                        stats[entry.name] = self.stats[entry.name]
+                    continue
+                stats[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        for name in set(self.stats) - listed:
+            self.remove(name)
+        for name, stat in stats.items():
+            if self.stats.get(name) != stat:
+                self.stats[name] = stat
+                self.firstChange.setdefault(name, now)
+                self.lastChange[name] = now
+        for name in [name for name, changed in self.lastChange.items() if now - changed >= self.debounce]:
+            del self.lastChange[name]
+            self.update(name, self.firstChange.pop(name))
+
+    def remove(self, name):
+        """a spec was deleted, so are its outputs"""
+        del self.stats[name]
+        self.firstChange.pop(name, None)
+        self.lastChange.pop(name, None)
+        params, isList = self.params.pop(name, ([], False))
+        for output in self.outputs(name, len(params), isList):
+            self.discard(output)
+        self.log('%s: removed' % name)
+
+    def discard(self, output):
+        with self.lock:
+            self.versions[output] = self.versions.get(output, 0) + 1
+        if os.path.exists(output):
+            os.remove(output)
+
+    def update(self, name, changed):
+        """reads a spec and queues the boxes whose parameters differ from the last run"""
+        try:
+            with open(os.path.join(self.specDir, name)) as spec:
+                data = json.load(spec)
+            isList = isinstance(data, list)
+            params = [parametersFromJson(item) for item in (data if isList else [data])]
+        except (OSError, ValueError) as e:
+            # the outputs of the last valid spec stay
+            with self.lock:
+                self.counters['errors'] += 1
+            self.log('%s: %s' % (name, e))
+            return
+        oldParams, oldIsList = self.params.get(name, ([], isList))
+        if oldIsList != isList:
+            # other output names, all boxes are new
+            for output in self.outputs(name, len(oldParams), oldIsList):
+                self.discard(output)
+            oldParams = []
+        for output in self.outputs(name, len(oldParams), isList)[len(params):]:
+            self.discard(output)
+        self.params[name] = (params, isList)
+        outputs = self.outputs(name, len(params), isList)
+        for i, (output, new) in enumerate(zip(outputs, params)):
+            if i < len(oldParams) and oldParams[i] == new:
+                with self.lock:
+                    self.counters['skipped'] += 1
+                continue
+            if i < len(oldParams):
+                self.log('%s: %s changed' % (os.path.basename(output), ', '.join(changedFields(oldParams[i], new))))
+            with self.lock:
+                version = self.versions[output] = self.versions.get(output, 0) + 1
+            self.jobs.put((output, new, version, changed))
+
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            try:
+                self.write(*job)
+            finally:
+                self.jobs.task_done()
+
+    def write(self, output, params, version, changed):
+        start = time.monotonic()
+        try:
+            svg = self.generate(params)
+        except Exception as e:
+            with self.lock:
+                self.counters['errors'] += 1
+            self.log('%s: %s' % (os.path.basename(output), e))
+            return
+        with self.lock:
+            if self.versions.get(output) != version:
+                self.counters['superseded'] += 1
+                return
+            temporary = output + '.tmp'
+            with open(temporary, 'wb') as out:
+                out.write(svg)
+            os.replace(temporary, output)
+            end = time.monotonic()
+            latency = end - changed
+            self.counters['generated'] += 1
+            self.latencies.append(latency)
+        self.log('%s: written %.0f ms after the change (generated in %.0f ms)' %
+                 (os.path.basename(output), latency * 1000.0, (end - start) * 1000.0))
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def run(self):
+        """polls until stop is called"""
+        while not self.stopped.is_set():
+            self.poll()
+            self.stopped.wait(self.interval)
+
+    def wait(self):
+        """waits until the queued jobs are done"""
+        self.jobs.join()
+
+    def stop(self):
+        self.stopped.set()
+        for worker in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='regenerates the svg layouts of changed JSON box specs')
+    parser.add_argument('specs', help='folder of the specs')
+    parser.add_argument('--out', default=None, help='folder of the svg layouts (default: the folder of the specs)')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--queueSize', type=int, default=8, help='generations queued at most')
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds between two polls of the folder')
+    parser.add_argument('--debounce', type=float, default=0.3, help='seconds a spec has to be unchanged')
+    options = parser.parse_args()
+
+    if options.out:
+        os.makedirs(options.out, exist_ok=True)
+    watcher = SpecWatcher(options.specs, options.out, options.workers, options.queueSize, options.interval,
+                          options.debounce)
+    watcher.start()
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+
+
+if __name__ == '__main__':
+    main()